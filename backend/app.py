@@ -23,20 +23,44 @@ Request Flow:
 Browser → POST /verify → Flask → OCR Service → Verification Service → JSON Response
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Request, request, jsonify, send_from_directory
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
-import os
 import tempfile
 
+import settings
+
 # Import our services
+from ocr_result import OCRResult
 from ocr_service import ocr_service
+from ocr_cascade import ocr_cascade
+from ocr_profiles import ocr_profiles
+from roi_registry import field_regions
 from verification_service import verification_service
+from timing import Deadline
+
+
+class UploadRequest(Request):
+    """
+    Flask request that keeps uploaded files in memory when possible.
+
+    Werkzeug's default writes every upload over 500 KB to a temp file, which
+    is most phone photos. We raise that threshold to
+    settings.UPLOAD_SPOOL_MAX_MEMORY: smaller uploads stay in RAM and are
+    decoded from there, bigger ones roll over to an anonymous temp file
+    (unique, never visible by name, deleted when closed).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(
+            max_size=settings.UPLOAD_SPOOL_MAX_MEMORY, mode='rb+'
+        )
 
 
 # Initialize Flask app
 # __name__ tells Flask where to look for templates/static files
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
+app.request_class = UploadRequest
 
 # Enable CORS (Cross-Origin Resource Sharing)
 # This allows our frontend (HTML page) to make requests to this backend
@@ -49,7 +73,10 @@ CORS(app)
 # Configuration
 # In production, you'd use environment variables, but for simplicity we hardcode these
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Max file size: 16 MB
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}  # Allowed image formats
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'tif', 'tiff'}  # Allowed image formats
+
+# Clients can ask for a shorter OCR deadline than OCR_REQUEST_TIMEOUT (seconds)
+DEADLINE_HEADER = 'X-Request-Timeout'
 
 
 def allowed_file(filename):
@@ -75,6 +102,91 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def request_deadline():
+    """
+    Time budget of the current request, starting now.
+
+    Returns:
+    --------
+    Deadline
+        settings.OCR_REQUEST_TIMEOUT seconds, or less if the client asked
+        for less in the X-Request-Timeout header (clients can't raise the
+        server's limit; an unreadable header is ignored)
+    """
+    seconds = settings.OCR_REQUEST_TIMEOUT
+    try:
+        requested = float(request.headers.get(DEADLINE_HEADER, ''))
+    except ValueError:
+        requested = 0.0
+    if requested > 0:
+        seconds = min(seconds, requested) if seconds > 0 else requested
+    return Deadline(seconds)
+
+
+def ocr_failure(result):
+    """
+    Error response for a failed OCR result.
+
+    A request that ran out of time is a 504 (Gateway Timeout) with the stage
+    timings it got through, so slow stages can be spotted. A photo rejected
+    by the quality gate is a 422 (the upload can't be processed: retake it),
+    with the measurements. An image with more pixels than we decode is a 413,
+    like an upload over MAX_CONTENT_LENGTH. Anything else is a 500.
+    """
+    if result.get("error_code") == "low_quality":
+        return jsonify({
+            "success": False,
+            "error": result["error"],
+            "quality": result.get("quality")
+        }), 422
+    if result.get("error_code") == "too_large":
+        return jsonify({
+            "success": False,
+            "error": result["error"]
+        }), 413
+    if result.get("error_code") == "timeout":
+        return jsonify({
+            "success": False,
+            "error": result["error"],
+            "timings": result.get("timings", {})
+        }), 504
+    return jsonify({
+        "success": False,
+        "error": result["error"]
+    }), 500  # 500 = Internal Server Error
+
+
+def confirm_near_duplicate(service, form_data, stream, deadline, candidate):
+    """
+    Check OCR text reused from a similar-looking earlier photo against this one.
+
+    Labels printed on the same template (same brand, another ABV or variety)
+    have perceptual hashes only a few bits apart, so a near-duplicate's text
+    is only used if it verifies AND the regions where its fields were found,
+    re-read on this photo, verify too: a few small crops instead of the whole
+    label (see roi_registry.py). Otherwise the whole label is OCR'd.
+
+    Returns:
+    --------
+    dict
+        `candidate` if confirmed, otherwise the OCR result of this image
+    """
+    verification = verification_service.verify_label(
+        form_data, OCRResult.from_dict(candidate["words"])
+    )
+    regions = field_regions(verification, candidate.get("image_size"))
+    confirmed = False
+    if verification["overall_match"] and regions:
+        reread = service.extract_text_from_stream(stream, deadline, list(regions.values()))
+        confirmed = reread["success"] and verification_service.verify_label(
+            form_data, OCRResult.from_dict(reread["words"])
+        )["overall_match"]
+    service.near_duplicates.record(confirmed)
+    if confirmed:
+        return candidate
+    return service.extract_text_from_stream(stream, deadline)
+
+
 @app.route('/')
 def index():
     """
@@ -102,6 +214,8 @@ def verify():
     - product_type: string (required)
     - abv: string (required)
     - net_contents: string (optional)
+    - ocr_profile: string (optional) - OCR profile to use instead of the one
+      picked from product_type (see ocr_profiles.py), e.g. "fine_print"
     - image: file upload (required)
 
     Response:
@@ -112,18 +226,33 @@ def verify():
         "overall_match": bool,
         "details": {...},
         "ocr_text": string,
-        "error": string (if failed)
+        "ocr_tier": string (only with OCR_CASCADE, see ocr_cascade.py),
+        "ocr_profile": string (without OCR_CASCADE: the OCR profile used),
+        "ocr_regions": bool (without OCR_CASCADE: True if only the regions
+                       where this brand's fields were found before were read),
+        "error": string (if failed),
+        "timings": dict (504 only: milliseconds per OCR stage reached)
     }
 
+    Deadline:
+    ---------
+    OCR gets OCR_REQUEST_TIMEOUT seconds from the moment the request arrives
+    (less if the X-Request-Timeout header asks for less). When it runs out,
+    Tesseract is stopped and the response is a 504 instead of a gunicorn
+    worker being killed mid-request.
+
     Process Flow:
     -------------
     1. Validate request (check image present, form fields filled)
-    2. Save uploaded image temporarily
-    3. Extract text with OCR service
-    4. Verify text with verification service
-    5. Clean up temporary file
-    6. Return results as JSON
+    2. Extract text with OCR service, straight from the upload stream
+       (for a brand verified before: first only where its fields were; for
+       a photo like an earlier one: that one's text, if re-reading its
+       fields here confirms it)
+    3. Verify text with verification service
+    4. Return results as JSON
     """
+    # The clock starts before the upload is parsed
+    deadline = request_deadline()
 
     # Step 1: Validate that an image was uploaded
     if 'image' not in request.files:
@@ -167,57 +296,106 @@ def verify():
             "error": f"Missing required fields: {', '.join(missing_fields)}"
         }), 400
 
-    # Step 3: Save uploaded image temporarily
-    # We need to save it to disk because pytesseract reads from file path
-    #
-    # secure_filename() cleans the filename to prevent security issues
-    # Example: "../../etc/passwd" becomes "etc_passwd"
-    filename = secure_filename(file.filename)
-
-    # Use system temp directory (automatically cleaned up by OS)
-    # This is better than creating our own uploads folder
-    temp_dir = tempfile.gettempdir()
-    temp_filepath = os.path.join(temp_dir, filename)
+    # The OCR profile (Tesseract vocabulary for wine, spirits, beer, ...);
+    # the cascade runs its own tiers instead
+    profile_name, service = None, ocr_service
+    if not settings.OCR_CASCADE:
+        try:
+            profile_name, service = ocr_profiles.service_for(
+                form_data["product_type"], request.form.get('ocr_profile', '').strip()
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
 
     try:
-        # Save the uploaded file
-        file.save(temp_filepath)
+        if settings.OCR_CASCADE:
+            # Steps 3-4 together: cheap OCR first, slower passes only for
+            # the fields that didn't match yet
+            cascade_result = ocr_cascade.verify(form_data, file.stream, deadline)
+            if not cascade_result["success"]:
+                return ocr_failure(cascade_result)
 
-        # Step 4: Extract text with OCR
-        ocr_result = ocr_service.extract_text_from_image(temp_filepath)
+            return jsonify({
+                "success": True,
+                "overall_match": cascade_result["overall_match"],
+                "details": cascade_result["details"],
+                "ocr_text": cascade_result["ocr_text"],
+                "ocr_tier": cascade_result["tier"]
+            }), 200
+
+        # Step 3a: A brand we've verified before? Read only where its
+        # fields were printed last time (see roi_registry.py)
+        regions = service.roi_registry.regions_for(form_data["brand_name"])
+        ocr_result = None
+        if regions:
+            roi_result = service.extract_text_from_stream(file.stream, deadline, regions)
+            if roi_result.get("error_code") in ("low_quality", "too_large", "timeout"):
+                # The whole label would fare no better
+                return ocr_failure(roi_result)
+            if "pages" in roi_result:
+                # Multi-page files are always read whole: nothing to fall
+                # back to
+                ocr_result = roi_result
+            elif roi_result["success"]:
+                verification_result = verification_service.verify_label(
+                    form_data,
+                    OCRResult.from_dict(roi_result["words"])
+                )
+                service.roi_registry.record(verification_result["overall_match"])
+                if verification_result["overall_match"]:
+                    return jsonify({
+                        "success": True,
+                        "overall_match": True,
+                        "details": verification_result["details"],
+                        "ocr_text": verification_result["ocr_text"],
+                        "ocr_profile": profile_name,
+                        "ocr_regions": True
+                    }), 200
+            else:
+                service.roi_registry.record(False)
+
+        # Step 3: Extract text with OCR
+        # The upload is handed over as a stream (in memory, or an anonymous
+        # spool file for big uploads - see UploadRequest), so nothing is
+        # saved to a named temp file and concurrent uploads can't collide
+        if ocr_result is None:
+            ocr_result = service.extract_text_from_stream(file.stream, deadline,
+                                                          allow_near_duplicate=True)
+            if ocr_result.get("near_duplicate"):
+                # Another photo's text: only if this photo confirms it
+                ocr_result = confirm_near_duplicate(service, form_data, file.stream,
+                                                    deadline, ocr_result)
 
         # Check if OCR succeeded
         if not ocr_result["success"]:
-            return jsonify({
-                "success": False,
-                "error": ocr_result["error"]
-            }), 500  # 500 = Internal Server Error
+            return ocr_failure(ocr_result)
 
-        # Step 5: Verify the extracted text against form data
+        # Step 4: Verify the extracted text against form data
+        # (handing over the recognized words, not just their text, tells
+        # the user where on the label each field was found)
         verification_result = verification_service.verify_label(
             form_data,
-            ocr_result["text"]
+            OCRResult.from_dict(ocr_result["words"])
         )
 
-        # Step 6: Clean up - delete temporary file
-        # Always clean up, even if there was an error
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
+        # Remember where this brand's fields are, for its next label
+        # (pages stacked from a multi-page file are no single label's layout)
+        if "pages" not in ocr_result:
+            service.roi_registry.learn(form_data["brand_name"], verification_result,
+                                       ocr_result.get("image_size"))
 
-        # Step 7: Return success response
+        # Step 5: Return success response
         return jsonify({
             "success": True,
             "overall_match": verification_result["overall_match"],
             "details": verification_result["details"],
-            "ocr_text": verification_result["ocr_text"]
+            "ocr_text": verification_result["ocr_text"],
+            "ocr_profile": profile_name,
+            "ocr_regions": False
         }), 200  # 200 = Success status code
 
     except Exception as e:
         # Catch any unexpected errors
-        # Always clean up temp file before returning error
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-
         return jsonify({
             "success": False,
             "error": f"Server error: {str(e)}"
@@ -242,6 +420,46 @@ def health():
     return jsonify({"status": "ok"}), 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Operational metrics endpoint.
+
+    Route: GET /metrics
+    Returns: JSON counters, e.g.
+    {
+        "ocr_backend": "tesserocr",
+        "ocr_cache": {"hits": 12, "misses": 30, "evictions": 0, ...},
+        "ocr_near_duplicates": {"hits": 3, "misses": 27, "confirmed": 2,
+                                "rejected": 1, "entries": 27, ...},
+        "ocr_cascade": {"requests": 9, "resolved_by": {"fast": 7, ...}, ...},
+        "ocr_profiles": {"enabled": true, "requests": {"wine": 4, ...},
+                         "services": {"wine": {"backend": "tesserocr",
+                                               "engine_pool": {...}}, ...}},
+        "ocr_brand_layouts": {"brands": 12, "roi_verified": 30, ...},
+        "ocr_quality": {"checked": 40, "rejected": {"blurry": 2, ...},
+                        "distributions": {"sharpness": {...}, ...}, ...},
+        "ocr_decode": {"max_bytes": 200000000, "peak": 48000000,
+                       "waits": 1, "downscaled": 0, "rejected": 0, ...}
+    }
+
+    Note: each gunicorn worker keeps its own counters, so repeated calls may
+    be answered by different workers.
+
+    Usage: curl http://localhost:5000/metrics
+    """
+    return jsonify({
+        "ocr_backend": ocr_service.backend.name,
+        "ocr_cache": ocr_service.cache.stats(),
+        "ocr_near_duplicates": ocr_service.near_duplicates.stats(),
+        "ocr_cascade": ocr_cascade.stats(),
+        "ocr_profiles": ocr_profiles.stats(),
+        "ocr_brand_layouts": ocr_service.roi_registry.stats(),
+        "ocr_quality": ocr_service.quality_gate.stats(),
+        "ocr_decode": ocr_service.decode_budget.stats()
+    }), 200
+
+
 # Error handlers
 @app.errorhandler(413)
 def file_too_large(e):
@@ -0,0 +1,245 @@
+"""
+Decode Limits - Keep decoded images from eating a worker's memory
+
+An upload is at most 16 MB (MAX_CONTENT_LENGTH), but that says little about
+its size once decoded: a PNG of a white 20000 x 20000 page compresses to a
+few hundred KB and decodes to 1.6 GB of RGB pixels (a "decompression bomb").
+Even honest uploads add up: a 48 MP phone photo is 192 MB decoded, and a
+gunicorn worker with several threads may decode several at once.
+
+Three Limits:
+-------------
+1. Header check: image formats store the width and height in the first few
+   bytes. Image.open() reads only those, so an image claiming more than
+   OCR_MAX_IMAGE_PIXELS is refused before a single pixel is decoded.
+2. Memory budget: the decoded images of all requests of one worker process
+   together stay under OCR_DECODE_MEMORY_BUDGET bytes. A request whose
+   image doesn't fit waits for others to finish (within its deadline).
+3. Decode smaller or refuse: a JPEG that wouldn't fit the budget is decoded
+   at 1/2, 1/4 or 1/8 scale straight from the file (draft mode). Other
+   formats can only be decoded whole, so one that is larger than the whole
+   budget on its own is refused, like limit 1.
+
+Bytes, Not Pixels:
+------------------
+The budget counts what Pillow really allocates: width x height x the bytes
+per pixel of the image's mode. Grayscale and palette images take 1 byte per
+pixel, 16-bit grayscale 2, and everything else 4 (Pillow keeps RGB pixels in
+4 bytes, not 3). The grayscale copies preprocessing makes afterwards (1 byte
+per pixel each) come on top.
+"""
+
+import math
+import threading
+
+from PIL import Image
+
+import settings
+from timing import DeadlineExceeded
+
+
+# DecodeBudget.check() takes the place of Pillow's own guard, which only
+# warns up to twice its limit and raises an error we couldn't tell apart
+# from a corrupt file. Every decode in OCRService goes through check().
+# Without a limit of our own (0), Pillow's stays in place.
+if settings.OCR_MAX_IMAGE_PIXELS:
+    Image.MAX_IMAGE_PIXELS = None
+
+
+class ImageTooLarge(Exception):
+    """The image has more pixels than this process will decode."""
+
+    def __init__(self, size, max_pixels):
+        self.size = size
+        self.max_pixels = max_pixels
+        super().__init__(
+            f"The image is too large ({size[0]} x {size[1]} pixels). "
+            f"Please upload an image of at most {max_pixels / 1_000_000:g} megapixels."
+        )
+
+
+def bytes_per_pixel(mode):
+    """Bytes Pillow stores each pixel of an image in `mode` in."""
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def decoded_bytes(size, mode):
+    """Memory an image of `size` takes once decoded in `mode`."""
+    return size[0] * size[1] * bytes_per_pixel(mode)
+
+
+def reduction_factor(size, max_pixels):
+    """
+    Smallest integer factor that shrinks an image of `size` to `max_pixels`.
+
+    Returns 1 if it already fits (or max_pixels is 0 = no limit).
+    """
+    pixels = size[0] * size[1]
+    if not max_pixels or pixels <= max_pixels:
+        return 1
+    return math.ceil(math.sqrt(pixels / max_pixels))
+
+
+class DecodeBudget:
+    """
+    Bytes of decoded images the requests of this process may hold at once.
+
+    Usage:
+    ------
+        reservation = decode_budget.reservation(deadline)
+        try:
+            decode_budget.check(image.size)         # header only, may raise
+            cost = decoded_bytes(image.size, image.mode)
+            decode_budget.check(image.size, cost)   # may raise
+            reservation.acquire(cost)               # may wait
+            image.load()
+            ...
+        finally:
+            reservation.release()
+    """
+
+    def __init__(self, max_bytes=200_000_000, max_image_pixels=100_000_000):
+        """
+        Parameters:
+        -----------
+        max_bytes : int
+            Budget of decoded image memory for all requests together; an
+            image that needs more on its own isn't decoded (0 = no limit)
+        max_image_pixels : int
+            Images whose header claims more are refused (0 = no limit)
+        """
+        self.max_bytes = max_bytes
+        self.max_image_pixels = max_image_pixels
+
+        self._available = threading.Condition()
+        self._in_use = 0
+        self._peak = 0
+        self._waits = 0
+        self._downscaled = 0
+        self._rejected = 0
+
+    def check(self, size, cost=None):
+        """
+        Raise ImageTooLarge if an image of `size` must not be decoded: its
+        header claims more than max_image_pixels, or decoding it takes
+        `cost` bytes, more than the whole budget.
+        """
+        pixels = size[0] * size[1]
+        if self.max_image_pixels and pixels > self.max_image_pixels:
+            max_pixels = self.max_image_pixels
+        elif self.max_bytes and cost is not None and cost > self.max_bytes:
+            # As many pixels as would fit at the same bytes per pixel
+            max_pixels = pixels * self.max_bytes // cost
+        else:
+            return
+        with self._available:
+            self._rejected += 1
+        raise ImageTooLarge(size, max_pixels)
+
+    def fit(self, size, mode):
+        """
+        Integer factor to decode an image of `size` in `mode` smaller by, so
+        it fits the budget (1 = full size). Counted in the stats if > 1.
+        """
+        factor = reduction_factor(size, self.max_bytes // bytes_per_pixel(mode))
+        if factor > 1:
+            with self._available:
+                self._downscaled += 1
+        return factor
+
+    def reservation(self, deadline):
+        """A new, empty reservation for one request (see DecodeReservation)."""
+        return DecodeReservation(self, deadline)
+
+    def _acquire(self, held, cost, deadline):
+        """
+        Grow a reservation from `held` to `cost` bytes, waiting for room.
+
+        A request that needs more gives up what it holds while it waits,
+        so two requests can never each hold half and wait for the other.
+        `cost` must not exceed the budget (see check()).
+        """
+        if not self.max_bytes:
+            return cost
+        with self._available:
+            if self._in_use - held + cost > self.max_bytes:
+                self._in_use -= held
+                self._available.notify_all()
+                self._waits += 1
+                fits = self._available.wait_for(
+                    lambda: self._in_use + cost <= self.max_bytes,
+                    timeout=deadline.remaining
+                )
+                if not fits:
+                    raise DeadlineExceeded("Timed out waiting for memory to decode the image")
+                held = 0
+            self._in_use += cost - held
+            self._peak = max(self._peak, self._in_use)
+        return cost
+
+    def _release(self, cost):
+        if not self.max_bytes or not cost:
+            return
+        with self._available:
+            self._in_use -= cost
+            self._available.notify_all()
+
+    def stats(self):
+        """
+        Counters for /metrics (memory in bytes).
+
+        Returns:
+        --------
+        dict
+            {"max_bytes": int, "max_image_pixels": int, "in_use": int,
+             "peak": int, "waits": int, "downscaled": int, "rejected": int}
+        """
+        with self._available:
+            return {
+                "max_bytes": self.max_bytes,
+                "max_image_pixels": self.max_image_pixels,
+                "in_use": self._in_use,
+                "peak": self._peak,
+                "waits": self._waits,
+                "downscaled": self._downscaled,
+                "rejected": self._rejected,
+            }
+
+
+class DecodeReservation:
+    """The bytes one request holds (see DecodeBudget.reservation)."""
+
+    def __init__(self, budget, deadline):
+        self.budget = budget
+        self.deadline = deadline
+        self.bytes = 0
+
+    def acquire(self, cost):
+        """
+        Hold at least `cost` bytes (no more than the whole budget, see
+        DecodeBudget.check), waiting for other requests to release theirs
+        if needed.
+
+        Raises DeadlineExceeded if the deadline passes while waiting.
+        """
+        if cost > self.bytes:
+            # _acquire() may have given everything back before failing
+            held, self.bytes = self.bytes, 0
+            self.bytes = self.budget._acquire(held, cost, self.deadline)
+
+    def release(self):
+        """Give the bytes back (safe to call more than once)."""
+        cost, self.bytes = self.bytes, 0
+        self.budget._release(cost)
+
+
+# One budget per process, shared by every OCRService in it (profiles,
+# cascade tiers): the memory being protected is the process's
+decode_budget = DecodeBudget(
+    max_bytes=settings.OCR_DECODE_MEMORY_BUDGET,
+    max_image_pixels=settings.OCR_MAX_IMAGE_PIXELS
+)
@@ -0,0 +1,176 @@
+"""
+Deskew - Straighten slightly rotated label photos
+
+A label photographed a few degrees off level (2-10° is typical for a phone
+held in one hand) makes every text line a slope. Tesseract's layout
+analysis then cuts lines into pieces, text blocks overlap, and both accuracy
+and speed drop. Turning the image back by the right angle costs one rotation.
+
+Projection Profiles:
+--------------------
+Add up the ink pixels of every row: when the text lines are level, the sum
+jumps between "line" rows (lots of ink) and "gap" rows (none), so the
+profile is spiky. Tilt the lines and every row cuts through several lines
+and gaps, and the profile flattens out. The skew is the angle at which the
+profile of the ROTATED ink is spikiest, measured as the sum of its squared
+values.
+
+Rotating the ink doesn't require rotating an image: a pixel at (x, y) lands
+in row y*cos(a) - x*sin(a). So for a whole set of candidate angles we
+compute all the row numbers as one (angles x pixels) array and count them
+with a single np.bincount - no loops over pixels or angles.
+
+Coarse to Fine:
+---------------
+Angles are tried 1° apart over +/- max_angle, then 0.1° apart within 1° of
+the best one: ~40 profiles instead of 200, on at most 60k ink pixels of a
+~800 px binarized thumbnail. The full-resolution image is then rotated once.
+"""
+
+import numpy as np
+from PIL import Image
+
+from text_geometry import ink_mask, thumbnail
+
+
+# Angle steps of the two search passes, in degrees
+COARSE_STEP = 1.0
+FINE_STEP = 0.1
+
+# At most this many ink pixels are projected (an even sample of them)
+MAX_INK_PIXELS = 60_000
+
+
+def profile_scores(ys, xs, angles):
+    """
+    Spikiness of the row profile of ink pixels rotated by each angle.
+
+    Parameters:
+    -----------
+    ys, xs : numpy.ndarray
+        Coordinates of the ink pixels
+    angles : numpy.ndarray
+        Candidate angles in degrees
+
+    Returns:
+    --------
+    numpy.ndarray
+        Sum of squared row counts per angle (higher = straighter lines)
+    """
+    radians = np.radians(angles)[:, None]
+    rows = np.rint(ys * np.cos(radians) - xs * np.sin(radians)).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+
+    # One bincount for every angle: give each angle its own range of bins
+    span = int(rows.max()) + 1
+    rows += np.arange(len(angles))[:, None] * span
+    counts = np.bincount(rows.ravel(), minlength=len(angles) * span)
+    counts = counts.reshape(len(angles), span).astype(np.float64)
+    return (counts * counts).sum(axis=1)
+
+
+class Deskewer:
+    """
+    Estimates the skew of a label photo and rotates it level.
+
+    Usage:
+    ------
+        deskewer = Deskewer(max_angle=10)
+        level = deskewer.deskew(gray, timer)
+    """
+
+    def __init__(self, enabled=True, max_angle=10.0, min_angle=0.5,
+                 min_gain=1.05, analysis_side=800):
+        """
+        Parameters:
+        -----------
+        enabled : bool
+            False leaves every image as it is (nothing is measured)
+        max_angle : float
+            Largest skew searched for, in degrees either way
+        min_angle : float
+            Smaller skews are left alone (Tesseract doesn't mind them, and
+            a rotation resamples every pixel)
+        min_gain : float
+            The profile at the best angle must be at least this much spikier
+            than at 0°; otherwise there are no clear text lines (a sideways
+            label, a photo of mostly artwork) and the image isn't touched
+        analysis_side : int
+            Long side of the thumbnail the profiles are computed on
+        """
+        self.enabled = enabled
+        self.max_angle = max_angle
+        self.min_angle = min_angle
+        self.min_gain = min_gain
+        self.analysis_side = analysis_side
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        if not self.enabled:
+            return "deskew=off"
+        return f"deskew={self.max_angle}:{self.min_angle}"
+
+    def estimate(self, gray):
+        """
+        Skew of an 'L' image in degrees.
+
+        Returns:
+        --------
+        float
+            Counter-clockwise rotation that levels the text lines (0.0 if
+            they are level, or if the skew can't be measured reliably)
+        """
+        small, _ = thumbnail(gray, self.analysis_side)
+        ys, xs = np.nonzero(ink_mask(small))
+        if len(ys) < 2:
+            return 0.0
+        if len(ys) > MAX_INK_PIXELS:
+            step = len(ys) // MAX_INK_PIXELS + 1
+            ys, xs = ys[::step], xs[::step]
+        ys = ys.astype(np.float32)
+        xs = xs.astype(np.float32)
+
+        coarse = np.arange(-self.max_angle, self.max_angle + COARSE_STEP / 2, COARSE_STEP)
+        scores = profile_scores(ys, xs, coarse)
+        best = coarse[np.argmax(scores)]
+
+        fine = best + np.arange(-COARSE_STEP, COARSE_STEP + FINE_STEP / 2, FINE_STEP)
+        fine_scores = profile_scores(ys, xs, fine)
+        angle = float(fine[np.argmax(fine_scores)])
+
+        level = profile_scores(ys, xs, np.zeros(1))[0]
+        if fine_scores.max() < self.min_gain * level:
+            return 0.0
+        return round(angle, 1)
+
+    def deskew(self, gray, timer):
+        """
+        Rotate an 'L' image so its text lines are level.
+
+        Parameters:
+        -----------
+        gray : PIL.Image
+        timer : StageTimer
+            Receives "deskew_analysis" and, if rotated, "deskew"
+
+        Returns:
+        --------
+        PIL.Image
+            The rotated image (grown to keep the corners; the new corners
+            are filled with the median brightness of the image), or `gray`
+            itself
+        """
+        if not self.enabled:
+            return gray
+        with timer.stage("deskew_analysis"):
+            angle = self.estimate(gray)
+        if abs(angle) < self.min_angle:
+            return gray
+        with timer.stage("deskew"):
+            small, _ = thumbnail(gray, self.analysis_side)
+            background = int(np.median(np.asarray(small)))
+            # Bilinear is half the time of bicubic on a 10 MP image, and
+            # the text is already at the size Tesseract reads best
+            return gray.rotate(angle, resample=Image.BILINEAR, expand=True,
+                               fillcolor=background)
@@ -0,0 +1,237 @@
+"""
+Dewarp - Unroll labels photographed on round bottles
+
+A label wrapped around a bottle faces the camera only in the middle. Towards
+the left and right edges it turns away, so the text there is squeezed
+horizontally - by cos(angle), where angle is how far around the bottle the
+text sits. At 60 degrees letters are half as wide as in the middle, and the
+long government warning lines run right out to those edges.
+
+The Cylinder Model:
+-------------------
+Seen from the front (and from far enough away that lines stay straight), a
+point at arc length s along the label, on a bottle of radius R whose axis
+is at image column c, appears at column
+
+    x = c + R * sin(s / R)
+
+Unrolling is the inverse: output column u shows input column
+x = c + R * sin(u / R). Rows don't move, so the whole dewarp is ONE table of
+source columns, shared by every row.
+
+Estimating the Curvature From the Text:
+----------------------------------------
+Glyph heights don't change around the bottle, widths shrink by cos(angle).
+So the width/height ratio of the glyphs, as a function of x, is
+
+    ratio(x) = r0 * sqrt(1 - ((x - c) / R)^2)
+    ratio(x)^2 = r0^2 - r0^2 * (x - c)^2 / R^2       ← a parabola in x
+
+Individual letters vary a lot ("I" vs "W"), so the glyphs are put into
+vertical strips and the median ratio of each strip is used. A least-squares
+parabola through the squared medians gives c (its peak) and R (from its
+curvature). A flat label gives a flat parabola, and nothing is done.
+
+Precomputed Remap Tables:
+-------------------------
+The source columns and interpolation weights depend only on the image width,
+the axis position and the radius. Both are rounded to buckets (1/64 of the
+width, 0.02 of curvature), so a batch of photos from the same bottle line
+reuses one cached table, and applying it is two fancy-indexing gathers and a
+weighted sum over the uint8 pixels.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from text_geometry import find_glyphs
+
+
+# Never unroll closer to the bottle's silhouette than this angle: the last
+# few degrees are squeezed to almost nothing and would be stretched into a
+# smear (sin(72°) ≈ 0.95)
+MAX_ANGLE = np.radians(72)
+
+# Buckets of the cached remap tables: axis position in 1/64ths of the image
+# width, curvature (half image width / radius) in steps of 0.02
+CENTRE_BUCKETS = 64
+CURVATURE_STEP = 0.02
+
+# Interpolation weights are 8-bit fixed point
+WEIGHT_BITS = 8
+
+
+@lru_cache(maxsize=32)
+def remap_table(width, centre_bucket, curvature_bucket):
+    """
+    Source columns and weights that unroll an image `width` pixels wide.
+
+    Parameters:
+    -----------
+    width : int
+        Width of the photo
+    centre_bucket : int
+        Bottle axis position, in 1/CENTRE_BUCKETS of the width
+    curvature_bucket : int
+        Half the width divided by the radius, in CURVATURE_STEPs
+
+    Returns:
+    --------
+    tuple
+        (left, weight): for output column u, the pixel is
+        row[left[u]] * (256 - weight[u]) + row[left[u] + 1] * weight[u],
+        divided by 256. Both are NumPy arrays of the output width.
+    """
+    centre = width * centre_bucket / CENTRE_BUCKETS
+    radius = (width / 2) / (curvature_bucket * CURVATURE_STEP)
+
+    # Angles of the image edges around the bottle, clipped at MAX_ANGLE
+    first = np.arcsin(np.clip((0 - centre) / radius, -np.sin(MAX_ANGLE), 0))
+    last = np.arcsin(np.clip((width - 1 - centre) / radius, 0, np.sin(MAX_ANGLE)))
+
+    # One output column per pixel of arc length
+    angles = first + np.arange(int((last - first) * radius)) / radius
+    source = np.clip(centre + radius * np.sin(angles), 0, width - 1.001)
+
+    left = source.astype(np.intp)
+    weight = ((source - left) * (1 << WEIGHT_BITS)).astype(np.uint16)
+    left.flags.writeable = False
+    weight.flags.writeable = False
+    return left, weight
+
+
+class CylinderDewarper:
+    """
+    Detects horizontally squeezed text near the sides of a round bottle and
+    unrolls the label.
+
+    Usage:
+    ------
+        dewarper = CylinderDewarper(enabled=True)
+        flat = dewarper.dewarp(gray, timer)
+    """
+
+    def __init__(self, enabled=False, max_squeeze=0.8, min_glyphs=40,
+                 strips=16, analysis_side=1000):
+        """
+        Parameters:
+        -----------
+        enabled : bool
+            False leaves every image as it is (nothing is measured)
+        max_squeeze : float
+            Only unroll when the outermost text is squeezed to less than
+            this fraction of its width in the middle (0.8 = 37 degrees
+            around the bottle); milder curvature doesn't hurt Tesseract
+        min_glyphs : int
+            Fewer glyphs than this are too few to fit a curve to
+        strips : int
+            Number of vertical strips the glyphs are grouped into
+        analysis_side : int
+            Long side of the thumbnail the glyphs are found on
+        """
+        self.enabled = enabled
+        self.max_squeeze = max_squeeze
+        self.min_glyphs = min_glyphs
+        self.strips = strips
+        self.analysis_side = analysis_side
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        if not self.enabled:
+            return "dewarp=off"
+        return f"dewarp={self.max_squeeze}"
+
+    def estimate(self, gray):
+        """
+        Fit the cylinder model to the glyphs of an 'L' image.
+
+        Returns:
+        --------
+        tuple or None
+            (centre_bucket, curvature_bucket) for remap_table(), or None if
+            the label looks flat or there isn't enough text to tell
+        """
+        glyphs = find_glyphs(gray, self.analysis_side)
+        if len(glyphs) < self.min_glyphs:
+            return None
+
+        # The label is photographed facing the camera, so the bottle's axis
+        # is taken to be halfway between the outermost glyphs (fitting it as
+        # well lets a ragged paragraph edge pull it sideways)
+        width = gray.size[0]
+        left = float(glyphs.left.min())
+        right = float((glyphs.left + glyphs.width).max())
+        centre = (left + right) / 2
+        half_span = (right - left) / 2
+        if half_span <= 0:
+            return None
+
+        # Median squared width/height ratio per strip; x in half-spans from
+        # the axis, so the outermost glyphs are at -1 and 1
+        xs = (glyphs.left + glyphs.width / 2 - centre) / half_span
+        ratios = (glyphs.width / glyphs.height) ** 2
+        strip = np.clip(((xs + 1) / 2 * self.strips).astype(np.intp), 0, self.strips - 1)
+        positions, medians, counts = [], [], []
+        for index in np.unique(strip):
+            members = strip == index
+            if members.sum() >= 3:
+                positions.append(float(np.median(xs[members])))
+                medians.append(float(np.median(ratios[members])))
+                counts.append(int(members.sum()))
+        if len(positions) < 4:
+            return None
+
+        # ratio^2 = a - b x^2 (weighted least squares); curved text has b > 0
+        weights = np.sqrt(counts)
+        design = np.stack([np.ones(len(positions)), -np.square(positions)], axis=1)
+        (a, b), *_ = np.linalg.lstsq(design * weights[:, None],
+                                     np.array(medians) * weights, rcond=None)
+        if a <= 0 or b <= 0:
+            return None
+        # half_span / R: how far around the bottle the outermost glyphs are
+        reach = float(np.sqrt(b / a))
+
+        # How squeezed is the outermost text?
+        if reach >= 1 or np.sqrt(1 - reach * reach) >= self.max_squeeze:
+            return None
+
+        radius = half_span / reach
+        centre_bucket = int(round(centre / width * CENTRE_BUCKETS))
+        curvature_bucket = max(1, int(round(width / 2 / radius / CURVATURE_STEP)))
+        return centre_bucket, curvature_bucket
+
+    def unroll(self, gray, centre_bucket, curvature_bucket):
+        """Apply the (cached) remap table for these buckets to an 'L' image."""
+        left, weight = remap_table(gray.size[0], centre_bucket, curvature_bucket)
+        pixels = np.asarray(gray)
+        # Fixed point: both neighbours weighted in uint16, then one shift
+        unrolled = (pixels[:, left] * ((1 << WEIGHT_BITS) - weight)
+                    + pixels[:, left + 1] * weight) >> WEIGHT_BITS
+        return Image.fromarray(unrolled.astype(np.uint8))
+
+    def dewarp(self, gray, timer):
+        """
+        Unroll an 'L' image if its text is curved around a bottle.
+
+        Parameters:
+        -----------
+        gray : PIL.Image
+        timer : StageTimer
+            Receives "dewarp_analysis" and, if unrolled, "dewarp"
+
+        Returns:
+        --------
+        PIL.Image
+            The unrolled image, or `gray` itself
+        """
+        if not self.enabled:
+            return gray
+        with timer.stage("dewarp_analysis"):
+            buckets = self.estimate(gray)
+        if buckets is None:
+            return gray
+        with timer.stage("dewarp"):
+            return self.unroll(gray, *buckets)
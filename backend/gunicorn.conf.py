@@ -0,0 +1,13 @@
+"""
+Gunicorn configuration (picked up automatically when gunicorn starts in backend/)
+
+We only use it to warm up the Tesseract engine pool in each worker right after
+it is forked, so the first label a worker sees doesn't pay the model-loading
+cost. Engines must be created AFTER the fork: native Tesseract state can't be
+shared between processes.
+"""
+
+
+def post_fork(server, worker):
+    from ocr_service import ocr_service
+    ocr_service.backend.warm()
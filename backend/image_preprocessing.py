@@ -0,0 +1,355 @@
+"""
+Image Preprocessing - Vectorized NumPy pipeline that prepares images for OCR
+
+Why NumPy?
+----------
+The original preprocessing used Pillow's ImageEnhance.Contrast, which builds
+a whole intermediate "degenerate" image and blends it with the input, so every
+request allocated several full-size copies of the photo.
+
+Point Operations Become One Lookup Table:
+-----------------------------------------
+Auto-contrast and global (Otsu) binarization are "point operations": the new
+value of a pixel depends only on its old value. Any chain of point operations
+is a single 256-entry lookup table (LUT), and everything those stages need to
+know about the image is in its 256-bin histogram.
+
+So instead of touching every pixel once per stage, we:
+1. Build the histogram once
+2. Let each stage work on the histogram (256 numbers, vectorized NumPy) and
+   produce its LUT; the next stage sees the histogram remapped by that LUT
+3. Compose all LUTs into one and apply it in a single pass over the pixels
+
+    photo ─convert('L')─► histogram ─► auto-contrast LUT ─► Otsu LUT
+                                              └──── composed ────┴─► one pixel pass
+
+The pixel pass uses Image.point(), Pillow's C lookup-table routine; on a
+12 MP photo it is several times faster than NumPy fancy indexing.
+
+Stages:
+-------
+1. Grayscale:     Pillow converts RGB → L in C (one byte per pixel).
+2. Auto-contrast: Find the darkest and brightest levels (ignoring the extreme
+                  `clip_percent` of pixels) and stretch that range to 0-255.
+                  Unlike a fixed contrast factor, this adapts to each photo.
+3. Binarize:      Optional. Turns every pixel black or white:
+                  - Otsu: one global threshold that best separates the two
+                    peaks of the histogram (fast, good for evenly lit labels).
+                    Computed from the histogram, so it is folded into the LUT.
+                  - Sauvola: a threshold per pixel from the local mean and
+                    standard deviation (handles shadows and glare), computed
+                    in O(1) per pixel with integral images and written back
+                    in place into the uint8 buffer.
+
+Each stage is timed individually (see timing.StageTimer).
+"""
+
+import numpy as np
+from PIL import Image
+
+from timing import StageTimer
+
+
+BINARIZATION_METHODS = ('otsu', 'sauvola')
+
+# Pixels per strip sauvola_binarize() thresholds at a time: its float64
+# working memory is about ten arrays of this size, whatever the image size
+SAUVOLA_STRIP_PIXELS = 1 << 18
+
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+# Swaps black and white (light-on-dark text → dark-on-light)
+INVERT_LUT = IDENTITY_LUT[::-1].copy()
+
+
+def to_grayscale(image):
+    """
+    Convert a Pillow image to 8-bit grayscale ('L' mode).
+
+    Each pixel becomes a single brightness value (0=black, 255=white).
+    """
+    if image.mode != 'L':
+        image = image.convert('L')
+    return image
+
+
+def histogram(image):
+    """256-bin histogram of an 'L' image, as a NumPy array."""
+    return np.array(image.histogram(), dtype=np.int64)
+
+
+def remap_histogram(hist, lut):
+    """
+    The histogram the image WOULD have after applying `lut`.
+
+    Every pixel at level i moves to level lut[i], so hist[i] is added to
+    bin lut[i] - no need to look at the pixels again.
+    """
+    return np.bincount(lut, weights=hist, minlength=256).astype(np.int64)
+
+
+def compose_luts(first, second):
+    """A single LUT equivalent to applying `first`, then `second`."""
+    return second[first]
+
+
+def apply_lut(image, lut):
+    """Map every pixel of an 'L' image through a 256-entry LUT in one pass."""
+    return image.point(lut.tolist())
+
+
+def auto_contrast_lut(hist, clip_percent=1.0):
+    """
+    LUT that stretches the used intensity range to 0-255.
+
+    Parameters:
+    -----------
+    hist : numpy.ndarray
+        256-bin histogram
+    clip_percent : float
+        Percentage of pixels ignored at EACH end of the histogram, so a few
+        specular highlights or pitch-black pixels don't defeat the stretch
+
+    Returns:
+    --------
+    numpy.ndarray
+        uint8 LUT (the identity if the image is flat, e.g. all white)
+    """
+    cumulative = np.cumsum(hist)
+    total = cumulative[-1]
+    clip = total * clip_percent / 100.0
+
+    low = int(np.searchsorted(cumulative, clip, side='right'))
+    high = int(np.searchsorted(cumulative, total - clip, side='left'))
+    if high <= low:
+        return IDENTITY_LUT
+
+    levels = np.arange(256, dtype=np.float32)
+    lut = np.clip((levels - low) * (255.0 / (high - low)), 0, 255)
+    return lut.astype(np.uint8)
+
+
+def otsu_threshold(hist):
+    """
+    Otsu's method: the threshold that maximizes between-class variance.
+
+    Evaluates all 256 candidate thresholds at once from the histogram.
+
+    Returns:
+    --------
+    int
+        Pixels > threshold are background (white), others are text (black)
+    """
+    hist = hist.astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+
+    weight_dark = np.cumsum(hist)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(hist * levels)
+    sum_total = sum_dark[-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_total - sum_dark) / weight_light
+        between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+
+    between = np.nan_to_num(between, nan=0.0, posinf=0.0, neginf=0.0)
+    return int(np.argmax(between))
+
+
+def threshold_lut(threshold):
+    """LUT mapping levels above `threshold` to white (255) and the rest to black."""
+    return np.where(np.arange(256) > threshold, 255, 0).astype(np.uint8)
+
+
+def integral_image(values, dtype=np.float64):
+    """
+    Summed-area table with a leading row and column of zeros.
+
+    integral[y, x] = sum of values[:y, :x], so the sum over any rectangle
+    [y0:y1, x0:x1] is four lookups:
+        integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    """
+    height, width = values.shape
+    integral = np.zeros((height + 1, width + 1), dtype=dtype)
+    np.cumsum(values, axis=0, dtype=dtype, out=integral[1:, 1:])
+    np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+    return integral
+
+
+def window_sums(integral, window):
+    """
+    Sum of every window x window neighbourhood (clipped at the borders).
+
+    Returns the sums and the number of pixels in each (clipped) window.
+    """
+    height = integral.shape[0] - 1
+    width = integral.shape[1] - 1
+    half = window // 2
+
+    y0 = np.clip(np.arange(height) - half, 0, height)
+    y1 = np.clip(np.arange(height) + half + 1, 0, height)
+    x0 = np.clip(np.arange(width) - half, 0, width)
+    x1 = np.clip(np.arange(width) + half + 1, 0, width)
+
+    # Difference along rows first, then along columns: two whole-row and
+    # two whole-column gathers instead of four scattered 2D lookups
+    rows = np.take(integral, y1, axis=0) - np.take(integral, y0, axis=0)
+    sums = np.take(rows, x1, axis=1) - np.take(rows, x0, axis=1)
+    counts = np.outer(y1 - y0, x1 - x0)
+    return sums, counts
+
+
+def sauvola_binarize(buffer, window=25, k=0.2, dynamic_range=128.0,
+                     strip_pixels=SAUVOLA_STRIP_PIXELS):
+    """
+    Sauvola local binarization using integral images, written back in place.
+
+    threshold(x, y) = mean * (1 + k * (std / dynamic_range - 1))
+
+    where mean and std are computed over the window x window neighbourhood.
+    In flat background areas std is low, so the threshold drops below the
+    local mean and background stays white even under a shadow.
+
+    Memory:
+    -------
+    The integral images, window sums and mean/std maps are float64 (the
+    sums of squares need the precision), and about ten of them are alive
+    at the peak. At the size of the whole image that is 80 bytes per
+    pixel (750 MB for a 12 MP photo), so the image is thresholded in
+    strips of rows of about `strip_pixels` pixels instead, each with the
+    window // 2 rows above and below that its windows reach into: ~28 MB
+    at the default, whatever the image size. The arithmetic runs in place
+    on those buffers. The rows just above a strip are kept as a copy,
+    since the strip before has already overwritten them.
+    """
+    height, width = buffer.shape
+    half = window // 2
+    rows = max(window, strip_pixels // max(width, 1))
+
+    above = np.empty((0, width), dtype=np.float64)
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        values = np.concatenate([above, buffer[top:min(bottom + half, height)]]).astype(
+            np.float64, copy=False)
+        first, count = len(above), bottom - top
+        above = values[max(0, first + count - half):first + count].copy()
+
+        strip = buffer[top:bottom]
+        sums, counts = window_sums(integral_image(values), window)
+        np.multiply(values, values, out=values)
+        sums_sq, _ = window_sums(integral_image(values), window)
+
+        # threshold = mean * (1 + k * (std / dynamic_range - 1)), in place
+        mean = np.divide(sums, counts, out=sums)
+        variance = np.divide(sums_sq, counts, out=sums_sq)
+        variance -= np.multiply(mean, mean, out=values)
+        np.maximum(variance, 0.0, out=variance)
+        threshold = np.sqrt(variance, out=variance)
+        threshold /= dynamic_range
+        threshold -= 1.0
+        threshold *= k
+        threshold += 1.0
+        threshold *= mean
+
+        text = strip <= threshold[first:first + count]
+        strip.fill(255)
+        strip[text] = 0
+    return buffer
+
+
+class PreprocessingPipeline:
+    """
+    Configurable grayscale → auto-contrast → (binarize) pipeline.
+
+    Usage:
+    ------
+        pipeline = PreprocessingPipeline(binarize='otsu')
+        processed = pipeline.run(image, timer)
+    """
+
+    def __init__(self, auto_contrast=True, clip_percent=1.0, binarize=None,
+                 sauvola_window=25, sauvola_k=0.2):
+        """
+        Parameters:
+        -----------
+        auto_contrast : bool
+            Stretch the histogram to the full 0-255 range
+        clip_percent : float
+            Percentage of darkest/brightest pixels ignored by auto-contrast
+        binarize : str or None
+            None, 'otsu' or 'sauvola'
+        sauvola_window : int
+            Neighbourhood size in pixels for Sauvola (roughly 1-2x text height)
+        sauvola_k : float
+            Sauvola sensitivity (0.2-0.5; higher = thinner text)
+        """
+        if binarize and binarize not in BINARIZATION_METHODS:
+            raise ValueError(
+                f"Unknown binarization method '{binarize}'. "
+                f"Use one of: {', '.join(BINARIZATION_METHODS)}"
+            )
+        self.auto_contrast = auto_contrast
+        self.clip_percent = clip_percent
+        self.binarize = binarize or None
+        self.sauvola_window = sauvola_window
+        self.sauvola_k = sauvola_k
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        parts = [f"ac={self.clip_percent if self.auto_contrast else 'off'}"]
+        if self.binarize == 'sauvola':
+            parts.append(f"bin=sauvola:{self.sauvola_window}:{self.sauvola_k}")
+        else:
+            parts.append(f"bin={self.binarize or 'off'}")
+        return ','.join(parts)
+
+    def run(self, image, timer=None):
+        """
+        Preprocess a Pillow image for OCR.
+
+        Parameters:
+        -----------
+        image : PIL.Image
+        timer : StageTimer, optional
+            Receives one timing per stage ("grayscale", "auto_contrast",
+            "binarize", "apply_lut")
+
+        Returns:
+        --------
+        PIL.Image
+            Grayscale ('L') image ready for OCR
+        """
+        if timer is None:
+            timer = StageTimer()
+
+        with timer.stage("grayscale"):
+            gray = to_grayscale(image)
+
+        # Point operations only look at the histogram and produce LUTs
+        lut = IDENTITY_LUT
+        if self.auto_contrast or self.binarize == 'otsu':
+            hist = histogram(gray)
+
+        if self.auto_contrast:
+            with timer.stage("auto_contrast"):
+                lut = auto_contrast_lut(hist, self.clip_percent)
+                hist = remap_histogram(hist, lut)
+
+        if self.binarize == 'otsu':
+            with timer.stage("binarize"):
+                lut = compose_luts(lut, threshold_lut(otsu_threshold(hist)))
+
+        # One pass over the pixels for all point operations together
+        if lut is not IDENTITY_LUT:
+            with timer.stage("apply_lut"):
+                gray = apply_lut(gray, lut)
+
+        if self.binarize == 'sauvola':
+            with timer.stage("binarize"):
+                buffer = np.array(gray, dtype=np.uint8)
+                sauvola_binarize(buffer, self.sauvola_window, self.sauvola_k)
+                gray = Image.fromarray(buffer)
+
+        return gray
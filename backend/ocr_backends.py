@@ -0,0 +1,485 @@
+"""
+OCR Backends - The engines OCRService can hand its images to
+
+OCRService does a lot before and after Tesseract runs (decoding, quality
+checks, deskewing, text blocks, caching, orientation). The Tesseract call
+itself is only two operations: "read the words in this image" and "which
+way up is this text?". A backend implements exactly those two, so the rest
+of the pipeline doesn't care which engine answers.
+
+Available Backends (OCR_BACKEND):
+---------------------------------
+    auto         tesserocr engine pool when tesserocr is installed, the
+                 pytesseract subprocess otherwise (the default)
+    tesserocr    in-process Tesseract API only (see tesseract_pool.py)
+    pytesseract  a new `tesseract` process per image
+    fake         no OCR at all: canned text after a fixed delay
+
+Why a Fake Engine?
+------------------
+Load-testing the web tier (Flask, gunicorn queueing, the verification
+rules) with real OCR mostly measures Tesseract: every request burns about a
+second of CPU, so the numbers say nothing about the rest. The fake engine
+sleeps for a configurable time - holding the worker like a real OCR call
+would, without using the CPU - and returns the same text every time, so
+runs are repeatable and verification has something realistic to check.
+
+Handing Images to the `tesseract` Process:
+------------------------------------------
+pytesseract saves every image as a PNG temp file for the `tesseract`
+program to read. PNG means zlib compression: on a 2 MP grayscale label that
+is 50-150 ms of CPU, often more than the preprocessing before it, only for
+Tesseract to decompress it again. PytesseractBackend can hand the image over
+uncompressed instead (OCR_SUBPROCESS_HANDOFF):
+
+    stdin   PGM bytes piped into `tesseract stdin stdout` (the default):
+            no file at all, the TSV is read straight from its stdout
+    pgm     an uncompressed PGM file in a RAM-backed directory (/dev/shm
+            where available), for builds that can't read stdin
+    png     pytesseract's own path, as before
+
+PGM ("portable graymap") is a short text header followed by the raw pixel
+bytes, so writing it is a memory copy. Tesseract reads PGM, BMP and PNG
+alike, and all three are lossless: the OCR output is the same.
+"""
+
+import io
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+import zlib
+
+import pytesseract
+
+from ocr_result import OCRResult
+from tesseract_pool import EngineInitError, TesseractEnginePool
+from timing import Deadline, DeadlineExceeded
+
+
+# Page segmentation mode 0: orientation and script detection only
+OSD_PAGE_SEG_MODE = 0
+
+# Ways PytesseractBackend can pass images to the `tesseract` process
+HANDOFFS = ('stdin', 'pgm', 'png')
+
+# Directory for 'pgm' handoff files: RAM-backed on Linux
+RAM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+# Text the fake engine returns unless it is given some: a complete label,
+# so verification finds every field of the sample form data
+FAKE_LABEL_TEXT = (
+    "OLD TOM DISTILLERY\n"
+    "\n"
+    "KENTUCKY STRAIGHT BOURBON WHISKEY\n"
+    "\n"
+    "45% Alc./Vol. (90 Proof)\n"
+    "750 mL\n"
+    "\n"
+    "GOVERNMENT WARNING: (1) ACCORDING TO THE SURGEON GENERAL, WOMEN SHOULD\n"
+    "NOT DRINK ALCOHOLIC BEVERAGES DURING PREGNANCY BECAUSE OF THE RISK OF\n"
+    "BIRTH DEFECTS. (2) CONSUMPTION OF ALCOHOLIC BEVERAGES IMPAIRS YOUR\n"
+    "ABILITY TO DRIVE A CAR OR OPERATE MACHINERY, AND MAY CAUSE HEALTH\n"
+    "PROBLEMS."
+)
+
+# Size of the made-up word boxes of the fake engine, in pixels
+FAKE_CHAR_WIDTH = 20
+FAKE_LINE_HEIGHT = 40
+
+
+class OCRBackend:
+    """
+    What OCRService needs from an OCR engine.
+
+    Subclasses implement recognize() and detect_orientation(); the rest has
+    sensible defaults.
+    """
+
+    # Short name, shown in cache keys and /metrics
+    name = "base"
+
+    # False for engines that don't really look at the pixels: OCRService
+    # then hands them the whole image once instead of every text block
+    reads_pixels = True
+
+    @property
+    def available(self):
+        """True if this backend can run in the current process."""
+        return True
+
+    @property
+    def signature(self):
+        """
+        Short description used in OCR cache keys.
+
+        Every real Tesseract backend produces the same words for the same
+        image, so they share one signature (and their cached results).
+        """
+        return "engine=tesseract"
+
+    def recognize(self, image, psm, deadline=None):
+        """
+        OCR a preprocessed image.
+
+        Parameters:
+        -----------
+        image : PIL.Image
+            Image ready for OCR
+        psm : int
+            Tesseract page segmentation mode
+        deadline : Deadline, optional
+            Recognition is stopped when it passes (raises DeadlineExceeded)
+
+        Returns:
+        --------
+        OCRResult
+        """
+        raise NotImplementedError
+
+    def detect_orientation(self, image, deadline=None):
+        """
+        How the text in `image` is rotated.
+
+        Returns:
+        --------
+        tuple or None
+            (degrees, confidence): rotating the image counter-clockwise by
+            `degrees` makes the text upright. None if unknown.
+        """
+        raise NotImplementedError
+
+    def warm(self):
+        """Load whatever the first request would otherwise wait for."""
+
+
+def _timeout(deadline):
+    """
+    pytesseract's `timeout` for a deadline (None = no deadline).
+
+    pytesseract reads 0 as "no limit", so 0 is only returned without a
+    deadline; one that has already passed raises DeadlineExceeded instead
+    of starting an unlimited `tesseract` run.
+    """
+    if deadline is None or deadline.remaining is None:
+        return 0
+    deadline.check()
+    # Still a few microseconds left: never round down to "no limit"
+    return max(deadline.remaining, 0.001)
+
+
+class PytesseractBackend(OCRBackend):
+    """
+    Runs the `tesseract` command line program once per image.
+
+    Every call starts a new process that loads the language model from
+    scratch; slow, but needs nothing besides the tesseract binary. How the
+    image gets to that process is set by `handoff` (see module doc).
+    """
+
+    name = "pytesseract"
+
+    def __init__(self, lang='eng', handoff='stdin', extra_args=()):
+        """
+        Parameters:
+        -----------
+        lang : str
+            Tesseract language (e.g. 'eng')
+        handoff : str
+            'stdin', 'pgm' or 'png' (see HANDOFFS)
+        extra_args : iterable of str
+            More `tesseract` options, e.g. an OCR profile's --user-words
+        """
+        if handoff not in HANDOFFS:
+            raise ValueError(
+                f"Unknown handoff {handoff!r}; expected one of {', '.join(HANDOFFS)}"
+            )
+        self.lang = lang
+        self.handoff = handoff
+        self.extra_args = list(extra_args)
+
+    def recognize(self, image, psm, deadline=None):
+        if deadline is None:
+            deadline = Deadline()
+        deadline.check()
+        if self.handoff != 'png':
+            return OCRResult.from_tsv(self._run_uncompressed(image, psm, deadline))
+        try:
+            return OCRResult.from_tsv(pytesseract.image_to_data(
+                image, lang=self.lang,
+                config=shlex.join(['--psm', str(psm)] + self.extra_args),
+                timeout=_timeout(deadline)
+            ))
+        except RuntimeError as e:
+            # pytesseract kills the process and raises a plain RuntimeError
+            if deadline.expired:
+                raise DeadlineExceeded(str(e)) from e
+            raise
+
+    def _run_uncompressed(self, image, psm, deadline):
+        """
+        Run `tesseract` on an uncompressed copy of `image` and return the
+        TSV it writes to stdout.
+        """
+        if image.mode not in ('L', 'RGB', '1'):
+            image = image.convert('RGB')
+        # PIL's "PPM" writer produces PGM for 'L' and PBM for '1' images
+        if self.handoff == 'stdin':
+            buffer = io.BytesIO()
+            image.save(buffer, format='PPM')
+            return self._run_process('stdin', buffer.getvalue(), psm, deadline)
+        with tempfile.NamedTemporaryFile(dir=RAM_DIR, prefix='tess_', suffix='.pnm') as f:
+            image.save(f, format='PPM')
+            f.flush()
+            return self._run_process(f.name, None, psm, deadline)
+
+    def _run_process(self, source, data, psm, deadline):
+        """
+        Start `tesseract source stdout` (feeding it `data` on stdin) and wait
+        for its output.
+
+        Errors are raised as pytesseract's exceptions (TesseractNotFoundError,
+        TesseractError), so callers handle every handoff the same way.
+        """
+        command = [pytesseract.pytesseract.tesseract_cmd, source, 'stdout',
+                   '-l', self.lang, '--psm', str(psm), *self.extra_args,
+                   '-c', 'tessedit_create_tsv=1']
+        try:
+            finished = subprocess.run(command, input=data, capture_output=True,
+                                      timeout=deadline.remaining)
+        except FileNotFoundError as e:
+            raise pytesseract.TesseractNotFoundError() from e
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run() has already killed the process
+            raise DeadlineExceeded("Tesseract was stopped at the deadline") from e
+
+        if finished.returncode:
+            message = finished.stderr.decode('utf-8', 'replace').strip()
+            raise pytesseract.TesseractError(finished.returncode, message)
+        return finished.stdout.decode('utf-8')
+
+    def detect_orientation(self, image, deadline=None):
+        try:
+            timeout = _timeout(deadline)
+        except DeadlineExceeded:
+            return None  # out of time: no orientation, like a timed-out run
+        try:
+            osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT,
+                                           timeout=timeout)
+            return osd["orientation"], osd["orientation_conf"]
+        except (RuntimeError, KeyError, pytesseract.TesseractError):
+            return None
+
+
+class TesserocrBackend(OCRBackend):
+    """
+    Runs Tesseract in-process on a pool of long-lived engines.
+
+    No process spawn, no model loading, no temp file: the image is handed
+    over in memory (see tesseract_pool.py).
+    """
+
+    def __init__(self, engine_pool, fallback=None):
+        """
+        Parameters:
+        -----------
+        engine_pool : TesseractEnginePool
+        fallback : OCRBackend, optional
+            Used whenever the pool isn't available (tesserocr not installed,
+            disabled, or its engines failed to load, in warm() or on first
+            use)
+        """
+        self.engine_pool = engine_pool
+        self.fallback = fallback
+
+    @property
+    def available(self):
+        return self.engine_pool.available or (
+            self.fallback is not None and self.fallback.available)
+
+    @property
+    def name(self):
+        if self.engine_pool.available or self.fallback is None:
+            return "tesserocr"
+        return self.fallback.name
+
+    def recognize(self, image, psm, deadline=None):
+        if not self.engine_pool.available and self.fallback is not None:
+            return self.fallback.recognize(image, psm, deadline)
+
+        try:
+            return self._recognize(image, psm, deadline)
+        except EngineInitError:
+            # Not warmed up (e.g. `python app.py`, no gunicorn post_fork):
+            # the first engine failed to load just now, and the pool is off
+            if self.fallback is None:
+                raise
+            return self.fallback.recognize(image, psm, deadline)
+
+    def _recognize(self, image, psm, deadline):
+        if deadline is None:
+            deadline = Deadline()
+        deadline.check()
+        remaining = deadline.remaining
+
+        with self.engine_pool.checkout() as engine:
+            # Engines are shared by every OCRService in the process, so
+            # the page segmentation mode is set on each call
+            engine.SetPageSegMode(psm)
+            engine.SetImage(image)
+            # Recognize(timeout) makes Tesseract poll a cancel callback
+            # while recognizing words and give up once the time is up
+            # (page layout analysis before that isn't interruptible, but
+            # is short)
+            if remaining is not None and not engine.Recognize(
+                    timeout=max(1, int(remaining * 1000))):
+                raise DeadlineExceeded("Tesseract was stopped at the deadline")
+            # Reads out the recognition above (or runs it, without a deadline)
+            return OCRResult.from_tsv(engine.GetTSVText(0))
+
+    def detect_orientation(self, image, deadline=None):
+        if not self.engine_pool.available and self.fallback is not None:
+            return self.fallback.detect_orientation(image, deadline)
+
+        try:
+            with self.engine_pool.checkout() as engine:
+                engine.SetPageSegMode(OSD_PAGE_SEG_MODE)
+                engine.SetImage(image)
+                osd = engine.DetectOrientationScript()
+        except EngineInitError:
+            if self.fallback is None:
+                return None
+            return self.fallback.detect_orientation(image, deadline)
+        except RuntimeError:
+            return None
+        if not osd:
+            return None
+        return osd["orient_deg"], osd["orient_conf"]
+
+    def warm(self):
+        self.engine_pool.warm()
+
+
+class FakeBackend(OCRBackend):
+    """
+    Pretends to OCR: waits `latency` seconds, then returns canned text.
+
+    The answer doesn't depend on the image at all, so the same request
+    always gets the same result. Words get made-up boxes (one row per line
+    of the text) so everything downstream that looks at positions works.
+
+    Usage:
+    ------
+        backend = FakeBackend(latency=0.8)
+        service = OCRService(backend=backend)
+    """
+
+    name = "fake"
+    reads_pixels = False
+
+    def __init__(self, text=FAKE_LABEL_TEXT, latency=0.0, confidence=90.0):
+        """
+        Parameters:
+        -----------
+        text : str
+            What every image "contains"; blank lines separate paragraphs
+        latency : float
+            Seconds each recognize() call takes (spent sleeping, not
+            computing, so the CPU stays free for the code being measured)
+        confidence : float
+            Confidence (0-100) reported for every word
+        """
+        self.text = text
+        self.latency = max(0.0, latency)
+        self.confidence = confidence
+
+    @property
+    def signature(self):
+        # Fake results must never be served as real ones from a shared cache
+        return f"engine=fake:{zlib.crc32(self.text.encode()):08x}:{self.confidence}"
+
+    @staticmethod
+    def _layout(text, confidence):
+        """Words of `text` with boxes on a fixed grid, as one OCRResult."""
+        words, boxes, line_ids, paragraph_ids = [], [], [], []
+        line_id, paragraph_id, new_paragraph = -1, 0, False
+        for row, line in enumerate(text.splitlines()):
+            if not line.strip():
+                new_paragraph = line_id >= 0
+                continue
+            line_id += 1
+            if new_paragraph:
+                paragraph_id += 1
+                new_paragraph = False
+            top = row * FAKE_LINE_HEIGHT
+            column = 0
+            for word in line.split():
+                left = column * FAKE_CHAR_WIDTH
+                words.append(word)
+                boxes.append((left, top, left + len(word) * FAKE_CHAR_WIDTH,
+                              top + FAKE_LINE_HEIGHT * 3 // 4))
+                line_ids.append(line_id)
+                paragraph_ids.append(paragraph_id)
+                column += len(word) + 1
+        return OCRResult(words, boxes, [confidence] * len(words), line_ids, paragraph_ids)
+
+    def recognize(self, image, psm, deadline=None):
+        if deadline is None:
+            deadline = Deadline()
+        deadline.check()
+        remaining = deadline.remaining
+        if remaining is not None and remaining < self.latency:
+            # A real engine would still be busy when the deadline passes
+            time.sleep(remaining)
+            raise DeadlineExceeded("Fake OCR was stopped at the deadline")
+        time.sleep(self.latency)
+        return self._layout(self.text, self.confidence)
+
+    def detect_orientation(self, image, deadline=None):
+        # Every image is already upright
+        return None
+
+
+def create_backend(name='auto', engine_pool=None, lang='eng', handoff='stdin',
+                   extra_args=(), fake_text=None, fake_latency=0.0):
+    """
+    Build the OCR backend selected by name (see OCR_BACKEND in settings.py).
+
+    Parameters:
+    -----------
+    name : str
+        'auto', 'tesserocr', 'pytesseract' or 'fake'
+    engine_pool : TesseractEnginePool, optional
+        Engines for the tesserocr backends (a default pool is built if
+        missing)
+    lang : str
+        Tesseract language
+    handoff : str
+        How the pytesseract backend passes images to `tesseract` (HANDOFFS)
+    extra_args : iterable of str
+        More `tesseract` options for the pytesseract backend (the tesserocr
+        engines get theirs from `engine_pool`)
+    fake_text : str, optional
+        Canned text of the fake backend (FAKE_LABEL_TEXT if None or empty)
+    fake_latency : float
+        Seconds per call of the fake backend
+
+    Returns:
+    --------
+    OCRBackend
+    """
+    name = (name or 'auto').strip().lower()
+    if name == 'fake':
+        return FakeBackend(text=fake_text or FAKE_LABEL_TEXT, latency=fake_latency)
+    subprocess_backend = PytesseractBackend(lang=lang, handoff=handoff, extra_args=extra_args)
+    if name == 'pytesseract':
+        return subprocess_backend
+    if name in ('auto', 'tesserocr'):
+        if engine_pool is None:
+            engine_pool = TesseractEnginePool(lang=lang)
+        fallback = subprocess_backend if name == 'auto' else None
+        return TesserocrBackend(engine_pool, fallback=fallback)
+    raise ValueError(
+        f"Unknown OCR backend {name!r}; expected 'auto', 'tesserocr', 'pytesseract' or 'fake'"
+    )
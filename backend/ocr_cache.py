@@ -0,0 +1,274 @@
+"""
+OCR Cache - Remembers OCR results for images we've already processed
+
+Why Cache?
+----------
+Users often fix a typo in the form and press "Verify" again with the SAME
+label image. Without a cache we run the whole OCR pipeline (1-3 seconds)
+again and get exactly the same text back.
+
+Content-Addressed Keys:
+-----------------------
+The cache key is a SHA-256 hash of:
+- the raw image bytes (same file → same hash, whatever its filename is)
+- the OCR pipeline version (preprocessing + Tesseract settings)
+
+Including the pipeline version means that changing preprocessing or
+Tesseract options automatically "invalidates" old entries: they simply stop
+being looked up.
+
+Two Tiers:
+----------
+1. Memory (per process): a bounded LRU dictionary. Fastest, but each
+   gunicorn worker has its own copy.
+2. Disk (optional, per host): a SQLite database shared by all gunicorn
+   workers on the machine. A label OCR'd by worker 1 is a hit for worker 2.
+
+Lookup order: memory → disk → run OCR (and store the result in both tiers).
+
+Counters (hits, misses, evictions) are exposed through stats() and the
+/metrics endpoint.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class OCRResultCache:
+    """
+    Two-tier (memory LRU + optional SQLite) cache of OCR results.
+
+    Values are JSON-serializable dicts (the OCRService result dict).
+    """
+
+    def __init__(self, max_entries=128, db_path=None, db_max_entries=10000):
+        """
+        Parameters:
+        -----------
+        max_entries : int
+            Maximum number of results kept in memory (0 disables the memory tier)
+        db_path : str or None
+            Path of the SQLite file for the shared disk tier (None disables it)
+        db_max_entries : int
+            Maximum number of rows kept on disk; oldest-used rows are evicted
+        """
+        self.max_entries = max_entries
+        self.db_path = db_path or None
+        self.db_max_entries = db_max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._db_pid = None
+
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(image_bytes, namespace):
+        """
+        Build a content-addressed cache key.
+
+        Parameters:
+        -----------
+        image_bytes : bytes or iterable of bytes
+            Raw contents of the uploaded image file. An iterable of chunks can
+            be passed to hash large uploads without loading them at once.
+        namespace : str
+            Pipeline version string (see OCRService.cache_namespace)
+
+        Returns:
+        --------
+        str
+            Hex SHA-256 digest
+        """
+        digest = hashlib.sha256()
+        digest.update(namespace.encode('utf-8'))
+        digest.update(b'\0')
+        if isinstance(image_bytes, (bytes, bytearray, memoryview)):
+            digest.update(image_bytes)
+        else:
+            for chunk in image_bytes:
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a result by key.
+
+        Returns:
+        --------
+        dict or None
+            The cached result, or None on a miss
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                # Mark as most recently used
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+
+        value = self._db_get(key)
+        if value is not None:
+            with self._lock:
+                self._counters["disk_hits"] += 1
+            # Promote to the memory tier so the next lookup is faster
+            self._memory_put(key, value)
+            return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        """Store a result in every enabled tier."""
+        with self._lock:
+            self._counters["stores"] += 1
+        self._memory_put(key, value)
+        self._db_put(key, value)
+
+    def stats(self):
+        """
+        Return cache counters for monitoring.
+
+        Note: counters are per gunicorn worker process. The disk tier itself
+        is shared, so "disk_entries" is the same for every worker.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            stats["evictions"] = stats["memory_evictions"] + stats["disk_evictions"]
+            stats["memory_entries"] = len(self._entries)
+            stats["memory_max_entries"] = self.max_entries
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["disk_enabled"] = self.db_path is not None
+        stats["disk_entries"] = self._db_count()
+        return stats
+
+    def clear(self):
+        """Drop every memory entry (the shared disk tier is left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+
+    def _memory_put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            # Evict least recently used entries until we're back under the limit
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["memory_evictions"] += 1
+
+    # ------------------------------------------------------------------
+    # Disk tier (SQLite)
+    # ------------------------------------------------------------------
+
+    def _connection(self):
+        """
+        Return this process's SQLite connection, opening it if needed.
+
+        SQLite connections must not cross a fork, so each gunicorn worker
+        opens its own. WAL mode lets many workers read while one writes.
+        Must be called with self._lock held.
+        """
+        if self._db is not None and self._db_pid == os.getpid():
+            return self._db
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        db = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS ocr_cache_accessed_at"
+            " ON ocr_cache (accessed_at)"
+        )
+        db.commit()
+
+        self._db = db
+        self._db_pid = os.getpid()
+        return db
+
+    def _db_get(self, key):
+        if self.db_path is None:
+            return None
+        try:
+            with self._lock:
+                db = self._connection()
+                row = db.execute(
+                    "SELECT value FROM ocr_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    "UPDATE ocr_cache SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+                db.commit()
+            return json.loads(row[0])
+        except sqlite3.Error:
+            # A broken or locked cache must never break OCR - treat as a miss
+            return None
+
+    def _db_put(self, key, value):
+        if self.db_path is None:
+            return
+        try:
+            with self._lock:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (key, value, accessed_at)"
+                    " VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time())
+                )
+                count = db.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+                overflow = count - self.db_max_entries
+                if overflow > 0:
+                    db.execute(
+                        "DELETE FROM ocr_cache WHERE key IN ("
+                        " SELECT key FROM ocr_cache ORDER BY accessed_at LIMIT ?)",
+                        (overflow,)
+                    )
+                    self._counters["disk_evictions"] += overflow
+                db.commit()
+        except sqlite3.Error:
+            pass
+
+    def _db_count(self):
+        if self.db_path is None:
+            return 0
+        try:
+            with self._lock:
+                db = self._connection()
+                return db.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        except sqlite3.Error:
+            return 0
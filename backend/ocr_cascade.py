@@ -0,0 +1,299 @@
+"""
+OCR Cascade - Cheap OCR first, expensive OCR only for fields that need it
+
+We don't need a perfect transcription of the label; we only need to confirm
+the brand name, product type, ABV, net contents and the government warning.
+Most clean photos get all of them from a quick, low-resolution OCR pass, so
+running the full pipeline on every upload wastes time.
+
+How It Works:
+-------------
+The cascade runs a list of OCR "tiers", cheapest first:
+
+    fast        ─► downscaled image, sparse-text mode (psm 11)
+    standard    ─► the normal pipeline (same as without the cascade)
+    binarized   ─► higher resolution + Sauvola binarization (shadows, glare)
+    rotate_90   ─► for labels photographed sideways or upside down;
+    rotate_270     only tried while neither the brand name nor the product
+    rotate_180     type has matched (short fields like "1 L" can match by
+                   chance in the garbage OCR makes of sideways text)
+
+After every tier, VerificationService checks that tier's text on its own.
+As soon as every field matches, we stop - later tiers never run. A field
+that matches in any tier counts as found, so the tiers add up: the standard
+pass may find the ABV the fast pass misread. Fields are merged, not texts:
+in the texts of two tiers joined together, a match could start in one and
+end in the other ("12" at the end of one, "% alc" at the start of the next).
+
+The result records which tier resolved the request (and each field), and
+per-process counters of resolving tiers are exposed on /metrics.
+
+Trade-off:
+----------
+A label that really doesn't match the form (the case we must catch) runs
+through every tier, so it takes longer than a single OCR pass. Matching
+labels, the common case, usually finish after the fast tier.
+
+Enable with OCR_CASCADE=true (see settings.py).
+"""
+
+import threading
+
+import settings
+from image_preprocessing import PreprocessingPipeline
+from ocr_service import OCRService, ocr_service
+from text_geometry import ResolutionNormalizer
+from verification_service import REQUIRED_FIELDS, verification_service
+
+
+TIER_NAMES = ('fast', 'standard', 'binarized', 'rotate_90', 'rotate_270', 'rotate_180')
+
+# Fast tier: small text at ~16 px is still readable in sparse-text mode and
+# needs far fewer pixels than the standard ~32 px
+FAST_GLYPH_HEIGHT = 16
+FAST_MIN_LONG_SIDE = 600
+
+# Binarized tier: more pixels than the standard pass, to rescue small print
+BINARIZED_GLYPH_HEIGHT = 48
+
+# Once one of these matched, the label was read the right way up
+ORIENTATION_FIELDS = ('brand_name', 'product_type')
+
+
+class CascadeTier:
+    """
+    One OCR pass of the cascade.
+
+    Attributes:
+    - name: used in results and metrics (e.g. "fast")
+    - service: the OCRService configured for this pass
+    - only_if_unreadable: skip this tier once one of ORIENTATION_FIELDS
+      has matched (rotations: if the brand name was read, the label isn't
+      sideways)
+    """
+
+    def __init__(self, name, service, only_if_unreadable=False):
+        self.name = name
+        self.service = service
+        self.only_if_unreadable = only_if_unreadable
+
+
+def build_tiers(base_service, names=TIER_NAMES):
+    """
+    Create the cascade tiers from a base OCRService.
+
+    Every tier shares the base service's OCR backend, result cache
+    (cache keys include each tier's settings, so entries don't mix) and
+    quality gate (a hopeless photo is rejected by the first tier, and every
+    tier's checks show up in the same /metrics counters).
+
+    Parameters:
+    -----------
+    base_service : OCRService
+        Used as-is for the "standard" tier
+    names : iterable of str
+        Which tiers to run, cheapest first (see TIER_NAMES)
+    """
+    shared = {
+        "engine_pool": base_service.engine_pool,
+        "backend": base_service.backend,
+        "cache": base_service.cache,
+        "quality_gate": base_service.quality_gate,
+    }
+    factories = {
+        "fast": lambda: OCRService(
+            psm=11,
+            resolution=ResolutionNormalizer(
+                target_glyph_height=FAST_GLYPH_HEIGHT,
+                min_long_side=FAST_MIN_LONG_SIDE
+            ),
+            **shared
+        ),
+        "standard": lambda: base_service,
+        "binarized": lambda: OCRService(
+            preprocessor=PreprocessingPipeline(binarize='sauvola'),
+            resolution=ResolutionNormalizer(
+                target_glyph_height=BINARIZED_GLYPH_HEIGHT,
+                min_long_side=settings.OCR_MIN_LONG_SIDE
+            ),
+            **shared
+        ),
+        "rotate_90": lambda: OCRService(rotation=90, **shared),
+        "rotate_270": lambda: OCRService(rotation=270, **shared),
+        "rotate_180": lambda: OCRService(rotation=180, **shared),
+    }
+
+    tiers = []
+    for name in names:
+        if name not in factories:
+            raise ValueError(
+                f"Unknown cascade tier '{name}'. Use any of: {', '.join(TIER_NAMES)}"
+            )
+        tiers.append(CascadeTier(name, factories[name](),
+                                 only_if_unreadable=name.startswith('rotate_')))
+    return tiers
+
+
+class OCRCascade:
+    """
+    Verification-driven OCR: escalates to slower passes only when needed.
+
+    Usage:
+    ------
+        cascade = OCRCascade()
+        result = cascade.verify(form_data, request.files['image'].stream)
+        result["tier"]  # e.g. "fast"
+    """
+
+    def __init__(self, base_service=None, verifier=None, tiers=None):
+        """
+        Parameters:
+        -----------
+        base_service : OCRService, optional
+            Standard OCR service (default: the app-wide ocr_service)
+        verifier : VerificationService, optional
+            Default: the app-wide verification_service
+        tiers : list of CascadeTier, optional
+            Default: built from settings.OCR_CASCADE_TIERS
+        """
+        self.base_service = base_service or ocr_service
+        self.verifier = verifier or verification_service
+        if tiers is None:
+            tiers = build_tiers(self.base_service, settings.OCR_CASCADE_TIERS)
+        self.tiers = tiers
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._resolved_by = {tier.name: 0 for tier in tiers}
+        self._unresolved = 0
+
+    def verify(self, form_data, source, deadline=None):
+        """
+        OCR an image tier by tier until every field of `form_data` matches.
+
+        Parameters:
+        -----------
+        form_data : dict
+            Same as VerificationService.verify_label()
+        source : bytes or file-like object
+            The uploaded image (see OCRService.extract_text_from_stream)
+        deadline : Deadline, optional
+            Time budget for ALL tiers together; a tier that runs out of time
+            ends the cascade with a "timeout" error
+
+        Returns:
+        --------
+        dict
+            {
+                "success": bool,          # False if no tier produced text
+                "error": str or None,
+                "error_code": str or None,  # as in extract_text_from_stream()
+                "overall_match": bool,    # as in verify_label()
+                "details": dict,          # as in verify_label()
+                "ocr_text": str,          # text of every tier that ran
+                "tier": str or None,      # tier that resolved every field
+                                          # (None = some field never matched)
+                "tiers_run": list,        # names, in order
+                "field_tiers": dict,      # field → first tier that matched it
+                "timings": dict           # tier → that tier's stage timings
+            }
+        """
+        # Every tier reads the image again, so it must be seekable
+        stream = self.base_service._as_seekable(source)
+
+        texts = []
+        tiers_run = []
+        field_tiers = {}
+        timings = {}
+        details = {}
+        resolved_by = None
+        error = None
+        error_code = None
+
+        for tier in self.tiers:
+            if tier.only_if_unreadable and any(
+                    field in field_tiers for field in ORIENTATION_FIELDS):
+                continue
+
+            result = tier.service.extract_text_from_stream(stream, deadline)
+            tiers_run.append(tier.name)
+            timings[tier.name] = result.get("timings", {})
+
+            if not result["success"]:
+                error, error_code = result["error"], result.get("error_code")
+                if error_code != "no_text":
+                    # Not a matter of image quality (e.g. Tesseract missing,
+                    # out of time): the other tiers would fail the same way
+                    break
+                continue
+
+            # Check this tier's text alone; fields add up across tiers: a
+            # field keeps the detail of the first tier that matched it, or
+            # else the latest miss
+            texts.append(result["text"])
+            verification = self.verifier.verify_label(form_data, result["text"])
+            for field, detail in verification["details"].items():
+                if detail["match"]:
+                    field_tiers.setdefault(field, tier.name)
+                if not details.get(field, {}).get("match"):
+                    details[field] = detail
+
+            if all(detail["match"] for detail in details.values()):
+                resolved_by = tier.name
+                break
+
+        self._record(resolved_by)
+
+        if not details or error_code == "timeout":
+            # A timeout is reported even if earlier tiers read some text:
+            # the request is over its budget either way
+            return {
+                "success": False,
+                "error": error,
+                "error_code": error_code,
+                "tier": None,
+                "tiers_run": tiers_run,
+                "field_tiers": {},
+                "timings": timings,
+            }
+
+        return {
+            "success": True,
+            "error": None,
+            "error_code": None,
+            "overall_match": all(details[field]["match"] for field in REQUIRED_FIELDS),
+            "details": details,
+            "ocr_text": "\n\n".join(texts),
+            "tier": resolved_by,
+            "tiers_run": tiers_run,
+            "field_tiers": field_tiers,
+            "timings": timings,
+        }
+
+    def _record(self, resolved_by):
+        with self._lock:
+            self._requests += 1
+            if resolved_by is None:
+                self._unresolved += 1
+            else:
+                self._resolved_by[resolved_by] += 1
+
+    def stats(self):
+        """
+        How often each tier was the one that resolved a request.
+
+        Returns:
+        --------
+        dict
+            {"requests": int, "resolved_by": {tier: int}, "unresolved": int}
+        """
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "resolved_by": dict(self._resolved_by),
+                "unresolved": self._unresolved,
+            }
+
+
+# Create a singleton instance (shares engines and cache with ocr_service)
+ocr_cascade = OCRCascade()
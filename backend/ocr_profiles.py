@@ -0,0 +1,385 @@
+"""
+OCR Profiles - Tesseract settings tuned to the kind of label being read
+
+A wine label, a beer can and a whiskey bottle use different words ("Cabernet
+Sauvignon", "IPA", "Kentucky Straight Bourbon") and different number formats
+("13.5%", "12 fl. oz.", "90 Proof"). Tesseract doesn't know any of them: it
+reads every label with the same generic English dictionary.
+
+What a Profile Sets:
+--------------------
+- psm: page segmentation mode (6 = one uniform block, for back labels that
+  are nothing but fine print)
+- oem: engine mode. The built-in profiles keep Tesseract's default: the
+  orientation detection (OSD) runs on the legacy engine, and engines
+  started LSTM-only (oem 1) abort in DetectOrientationScript().
+- user words: vocabulary of the label class, added to Tesseract's
+  dictionary. A word the dictionary knows is accepted sooner, and a misread
+  close to a known word is pulled towards it ("Sauvignan" → "Sauvignon").
+- user patterns: shapes of words the dictionary can't list, like ABVs and
+  volumes (\\d = digit, \\* = "the previous one, repeated")
+- dpi: a resolution hint. The built-in profiles leave it unset: without
+  one, Tesseract estimates the resolution of every image from its text
+  size, and on our resampled images a fixed 300 dpi made it drop whole
+  lines of the government warning.
+
+Picking a Profile:
+------------------
+/verify picks the profile from the product type the user typed: the LAST
+word that names a class wins, because in English the last noun is the
+thing itself ("Bourbon Barrel Aged Stout" is a beer). Product types that
+don't name a class use the "default" profile, i.e. plain Tesseract.
+
+User words and patterns have to be loaded when a Tesseract engine starts,
+so every profile gets its own engines (created lazily, the first time a
+label of that class arrives). Each OCR profile service shares the cache,
+near-duplicate index, quality gate and brand layouts of the base service;
+cache keys include the profile.
+
+Enable with OCR_PROFILES=true (see settings.py).
+"""
+
+import atexit
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zlib
+
+import settings
+
+
+# Words and word shapes on every US alcohol label
+COMMON_WORDS = (
+    "GOVERNMENT", "WARNING", "SURGEON", "GENERAL", "ACCORDING", "PREGNANCY",
+    "ALCOHOLIC", "BEVERAGES", "CONSUMPTION", "IMPAIRS", "MACHINERY",
+    "Alc./Vol.", "Alc/Vol", "ABV", "Vol.", "mL", "Bottled", "Produced",
+    "Imported", "Contains",
+)
+COMMON_PATTERNS = (
+    "\\d\\*%", "\\d\\*.\\d\\*%", "\\d\\*mL", "\\d\\*.\\d\\*L", "(\\d\\*)",
+)
+
+
+# Directory of this process's word files, see _word_directory()
+_word_dir = None
+_word_dir_pid = None
+_word_dir_lock = threading.Lock()
+
+
+def _word_directory():
+    """
+    Private directory (mode 0700, from mkdtemp) for this process's word
+    files, removed when the process exits.
+
+    A fixed name in the shared temp directory could be created first by
+    another local user, with a word list of their choosing. A forked
+    worker gets a directory of its own, so that it never removes the one
+    its parent and siblings still load engines from.
+    """
+    global _word_dir, _word_dir_pid
+    with _word_dir_lock:
+        if _word_dir_pid != os.getpid():
+            _word_dir = tempfile.mkdtemp(prefix="ocr-profiles-")
+            _word_dir_pid = os.getpid()
+            atexit.register(_remove_word_directory, _word_dir, _word_dir_pid)
+        return _word_dir
+
+
+def _remove_word_directory(path, pid):
+    # Forked children inherit the atexit hook of their parent's directory
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class OCRProfile:
+    """
+    Tesseract settings for one class of labels.
+
+    Usage:
+    ------
+        profile = PROFILES["wine"]
+        profile.tesseract_args()       # for the tesseract command line
+        profile.tesseract_variables()  # for tesserocr engines
+    """
+
+    def __init__(self, name, keywords=(), psm=3, oem=None, dpi=None,
+                 user_words=(), user_patterns=()):
+        """
+        Parameters:
+        -----------
+        name : str
+            Used in cache keys, metrics and the `ocr_profile` form field
+        keywords : iterable of str
+            Lower-case product type words that select this profile
+        psm : int
+            Tesseract page segmentation mode
+        oem : int, optional
+            Tesseract engine mode (None: Tesseract's default)
+        dpi : int, optional
+            Resolution hint (None: Tesseract guesses)
+        user_words, user_patterns : iterable of str
+            Extra dictionary words and word patterns
+        """
+        self.name = name
+        self.keywords = frozenset(keywords)
+        self.psm = psm
+        self.oem = oem
+        self.dpi = dpi
+        self.user_words = tuple(user_words)
+        self.user_patterns = tuple(user_patterns)
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        if not (self.oem is not None or self.dpi or self.user_words or self.user_patterns):
+            return f"profile={self.name}"
+        settings_text = "\n".join((str(self.oem), str(self.dpi)) + self.user_words
+                                  + ("",) + self.user_patterns)
+        return f"profile={self.name}:{zlib.crc32(settings_text.encode()):08x}"
+
+    def _word_file(self, kind, lines):
+        """
+        Path of a file holding `lines`, in this process's private directory
+        (see _word_directory; written once, the name includes a hash of the
+        content).
+        """
+        if not lines:
+            return None
+        content = "\n".join(lines) + "\n"
+        path = os.path.join(
+            _word_directory(),
+            f"{self.name}-{zlib.crc32(content.encode()):08x}.{kind}"
+        )
+        if not os.path.exists(path):
+            # Write and rename, so a concurrent thread never reads half a file
+            handle, partial = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(handle, 'w') as f:
+                f.write(content)
+            os.replace(partial, path)
+        return path
+
+    def tesseract_variables(self):
+        """Init-time Tesseract variables for tesserocr engines of this profile."""
+        variables = {}
+        words = self._word_file('user-words', self.user_words)
+        if words:
+            variables['user_words_file'] = words
+        patterns = self._word_file('user-patterns', self.user_patterns)
+        if patterns:
+            variables['user_patterns_file'] = patterns
+        if self.dpi:
+            variables['user_defined_dpi'] = str(self.dpi)
+        return variables
+
+    def tesseract_args(self):
+        """The same settings as `tesseract` command line options (except psm)."""
+        args = []
+        if self.oem is not None:
+            args += ['--oem', str(self.oem)]
+        if self.dpi:
+            args += ['--dpi', str(self.dpi)]
+        words = self._word_file('user-words', self.user_words)
+        if words:
+            args += ['--user-words', words]
+        patterns = self._word_file('user-patterns', self.user_patterns)
+        if patterns:
+            args += ['--user-patterns', patterns]
+        return args
+
+
+def _site_words():
+    """Brand names etc. from OCR_USER_WORDS_FILE (one per line), if set."""
+    if not settings.OCR_USER_WORDS_FILE:
+        return ()
+    with open(settings.OCR_USER_WORDS_FILE, encoding='utf-8') as f:
+        return tuple(line.strip() for line in f if line.strip())
+
+
+def _named_profile(name, keywords, words=(), patterns=(), psm=3):
+    """A label-class profile: the common vocabulary plus the class's own."""
+    return OCRProfile(
+        name, keywords=keywords, psm=psm,
+        user_words=COMMON_WORDS + tuple(words) + _site_words(),
+        user_patterns=COMMON_PATTERNS + tuple(patterns)
+    )
+
+
+def build_profiles():
+    """Every profile by name, the label-class ones with settings' site words."""
+    profiles = [
+        OCRProfile("default"),
+        _named_profile(
+            "wine",
+            keywords=("wine", "cabernet", "sauvignon", "merlot", "chardonnay", "pinot",
+                      "riesling", "zinfandel", "syrah", "shiraz", "malbec", "rosé",
+                      "rose", "champagne", "sparkling", "prosecco", "sherry", "port",
+                      "vermouth", "blanc", "noir", "cider"),
+            words=("Cabernet", "Sauvignon", "Merlot", "Chardonnay", "Pinot", "Noir",
+                   "Grigio", "Blanc", "Riesling", "Zinfandel", "Syrah", "Shiraz",
+                   "Malbec", "Rosé", "Vintage", "Estate", "Appellation", "Reserve",
+                   "Vineyard", "Vineyards", "Cellars", "Winery", "Sulfites"),
+            patterns=("\\d\\d\\d\\d",)
+        ),
+        _named_profile(
+            "spirits",
+            keywords=("spirit", "spirits", "whiskey", "whisky", "bourbon", "scotch",
+                      "rye", "vodka", "gin", "rum", "tequila", "mezcal", "brandy",
+                      "cognac", "liqueur", "schnapps", "absinthe"),
+            words=("Whiskey", "Whisky", "Bourbon", "Kentucky", "Tennessee", "Straight",
+                   "Rye", "Scotch", "Single", "Malt", "Vodka", "Gin", "Rum", "Tequila",
+                   "Mezcal", "Brandy", "Cognac", "Liqueur", "Distillery", "Distilled",
+                   "Aged", "Years", "Proof", "Cask", "Barrel", "Batch"),
+            patterns=("\\d\\*",)
+        ),
+        _named_profile(
+            "beer",
+            keywords=("beer", "ale", "lager", "ipa", "stout", "porter", "pilsner",
+                      "pilsener", "malt", "hefeweizen", "weizen", "saison", "bock",
+                      "kolsch", "kölsch", "seltzer"),
+            words=("Ale", "Lager", "IPA", "Stout", "Porter", "Pilsner", "India", "Pale",
+                   "Brewing", "Brewery", "Brewed", "Hops", "Hopped", "Malt", "Craft",
+                   "fl.", "oz.", "FL.", "OZ."),
+            patterns=("\\d\\*oz", "\\d\\*.\\d\\*oz")
+        ),
+        # Back labels that are nothing but the warning and small print: one
+        # uniform block of text. Only picked explicitly (ocr_profile field).
+        _named_profile("fine_print", keywords=(), psm=6),
+    ]
+    return {profile.name: profile for profile in profiles}
+
+
+PROFILES = build_profiles()
+
+
+def profile_for(product_type, profiles=None):
+    """
+    Name of the profile for a product type, e.g. "India Pale Ale" → "beer".
+
+    The last word of the product type that is a keyword of some profile
+    decides; "default" if none is.
+    """
+    profiles = PROFILES if profiles is None else profiles
+    chosen = "default"
+    for word in re.findall(r"[^\W\d_]+", (product_type or "").lower()):
+        for profile in profiles.values():
+            if word in profile.keywords:
+                chosen = profile.name
+    return chosen
+
+
+class ProfiledOCR:
+    """
+    One OCRService per profile, built on first use.
+
+    Usage:
+    ------
+        name, service = ocr_profiles.service_for("Cabernet Sauvignon")
+        result = service.extract_text_from_stream(stream, deadline)
+    """
+
+    def __init__(self, base_service=None, profiles=None, enabled=None):
+        """
+        Parameters:
+        -----------
+        base_service : OCRService, optional
+            Used as-is for the "default" profile; the others share its cache,
+            near-duplicate index, quality gate and brand layouts (default:
+            the app-wide ocr_service)
+        profiles : dict, optional
+            name → OCRProfile (default: PROFILES)
+        enabled : bool, optional
+            False always answers with the base service (default:
+            settings.OCR_PROFILES)
+        """
+        from ocr_service import ocr_service
+
+        self.base_service = base_service or ocr_service
+        self.profiles = PROFILES if profiles is None else profiles
+        self.enabled = settings.OCR_PROFILES if enabled is None else enabled
+
+        self._lock = threading.Lock()
+        self._services = {"default": self.base_service}
+        self._requests = {name: 0 for name in self.profiles}
+
+    def service_for(self, product_type, name=None):
+        """
+        The OCRService for a label.
+
+        Parameters:
+        -----------
+        product_type : str
+            As typed in the form; picks the profile (see profile_for)
+        name : str, optional
+            Profile asked for explicitly; overrides the product type
+
+        Returns:
+        --------
+        tuple
+            (profile name, OCRService)
+
+        Raises:
+        -------
+        ValueError
+            If `name` isn't a known profile
+        """
+        if name:
+            if name not in self.profiles:
+                raise ValueError(
+                    f"Unknown OCR profile '{name}'. Use any of: {', '.join(self.profiles)}"
+                )
+        elif self.enabled:
+            name = profile_for(product_type, self.profiles)
+        else:
+            name = "default"
+
+        with self._lock:
+            self._requests[name] += 1
+            if name not in self._services:
+                self._services[name] = self._build(self.profiles[name])
+            return name, self._services[name]
+
+    def _build(self, profile):
+        from ocr_service import OCRService
+
+        base = self.base_service
+        # No engine_pool or backend: the service builds its own engines,
+        # started with the profile's words and patterns
+        return OCRService(
+            cache=base.cache,
+            near_duplicates=base.near_duplicates,
+            quality_gate=base.quality_gate,
+            roi_registry=base.roi_registry,
+            profile=profile,
+            psm=profile.psm
+        )
+
+    def stats(self):
+        """
+        Requests per profile (since this process started), and the OCR
+        backend and engine pool of every profile built so far - each has
+        engines of its own.
+
+        Returns:
+        --------
+        dict
+            {"enabled": bool, "requests": {name: int},
+             "services": {name: {"backend": str, "engine_pool": dict}}}
+        """
+        with self._lock:
+            requests = dict(self._requests)
+            services = dict(self._services)
+        return {
+            "enabled": self.enabled,
+            "requests": requests,
+            "services": {
+                name: {"backend": service.backend.name,
+                       "engine_pool": service.engine_pool.stats()}
+                for name, service in services.items()
+            },
+        }
+
+
+# Create a singleton instance (the default profile is ocr_service itself)
+ocr_profiles = ProfiledOCR()
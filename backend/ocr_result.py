@@ -0,0 +1,283 @@
+"""
+OCR Result - Words, positions and confidences from one Tesseract pass
+
+Tesseract knows much more than the plain text it prints: where every word
+is, which line and paragraph it belongs to, and how sure it was. We used to
+throw that away (or ask for it in a second pass). OCRResult keeps it.
+
+Columns, Not Dicts:
+-------------------
+A label has a few hundred words. Instead of one dict per word, the result
+stores one column per attribute, all in the same word order:
+
+    words          ['OLD', 'TOM', 'DISTILLERY', 'BOURBON', ...]   str
+    boxes          [[228, 220, 373, 274], ...]                    int32 (N, 4)
+    confidences    [92.5, 91.5, 91.6, 91.1, ...]                  float32
+    line_ids       [0, 0, 0, 1, ...]                              int32
+    paragraph_ids  [0, 0, 0, 1, ...]                              int32
+
+Boxes are (left, top, right, bottom) in pixels of the OCR'd image. The
+NumPy columns are compact, pickle quickly to worker processes, and make
+"shift every box", "keep these words" or "mean confidence" one array
+operation instead of a Python loop.
+
+Lazy Text:
+----------
+The plain text (what VerificationService reads) is rebuilt from the words
+only when someone asks for it, and then remembered. Intermediate results -
+one per text block, tile or rotation - are merged or compared by confidence
+without ever building their strings.
+
+Where the Words Come From:
+--------------------------
+Tesseract's TSV output ("tsv" renderer) has one row per layout element:
+
+    level  page  block  par  line  word  left  top  width  height  conf  text
+
+Word rows are level 5; the others describe blocks, paragraphs and lines and
+have conf -1. tesserocr returns it from GetTSVText(), pytesseract from
+image_to_data() - the same recognition that produces the text, so one pass.
+"""
+
+import numpy as np
+
+
+# Level of word rows in Tesseract's TSV output
+TSV_WORD_LEVEL = '5'
+TSV_COLUMNS = 12
+
+
+class OCRResult:
+    """
+    Words Tesseract recognized in one image, stored column by column.
+
+    Usage:
+    ------
+        result = OCRResult.from_tsv(engine.GetTSVText(0))
+        result.text         # 'OLD TOM DISTILLERY\\n\\nBOURBON WHISKEY ...'
+        result.confidence   # mean word confidence, 0-100
+        result.locate("bourbon whiskey")
+        # {'box': (397, 346, 808, 380), 'confidence': 91.7}
+    """
+
+    def __init__(self, words=(), boxes=(), confidences=(), line_ids=(), paragraph_ids=()):
+        """
+        Parameters:
+        -----------
+        words : sequence of str
+            One entry per word, in reading order
+        boxes : array-like, shape (N, 4)
+            (left, top, right, bottom) per word
+        confidences : array-like
+            Tesseract's word confidence (0-100) per word
+        line_ids, paragraph_ids : array-like
+            Line and paragraph number per word; never decrease, so all words
+            of a line are next to each other
+        """
+        self.words = list(words)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32)
+        self.line_ids = np.asarray(line_ids, dtype=np.int32)
+        self.paragraph_ids = np.asarray(paragraph_ids, dtype=np.int32)
+        self._text = None
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """
+        Parse Tesseract's TSV output (with or without its header row).
+
+        Rows that aren't words, have no confidence, or contain only
+        whitespace are skipped.
+        """
+        words, boxes, confidences, line_ids, paragraph_ids = [], [], [], [], []
+        line_key = paragraph_key = None
+        line_id = paragraph_id = -1
+
+        for row in tsv.splitlines():
+            fields = row.split('\t')
+            if len(fields) < TSV_COLUMNS or fields[0] != TSV_WORD_LEVEL:
+                continue
+            word = fields[11].strip()
+            confidence = float(fields[10])
+            if confidence < 0 or not word:
+                continue
+
+            # (page, block, paragraph[, line]) identify the word's paragraph and line
+            key = tuple(fields[1:5])
+            if key[:3] != paragraph_key:
+                paragraph_key = key[:3]
+                paragraph_id += 1
+            if key != line_key:
+                line_key = key
+                line_id += 1
+
+            left, top, width, height = (int(value) for value in fields[6:10])
+            words.append(word)
+            boxes.append((left, top, left + width, top + height))
+            confidences.append(confidence)
+            line_ids.append(line_id)
+            paragraph_ids.append(paragraph_id)
+
+        return cls(words, boxes, confidences, line_ids, paragraph_ids)
+
+    @classmethod
+    def concatenate(cls, results, offsets=None):
+        """
+        Merge results OCR'd from parts of one image into a single result.
+
+        Parameters:
+        -----------
+        results : list of OCRResult
+            In reading order; lines and paragraphs of different parts are
+            never merged
+        offsets : list of (x, y), optional
+            Position of each part in the full image; its boxes are shifted
+            by it so every box is in full-image coordinates
+        """
+        if offsets is None:
+            offsets = [(0, 0)] * len(results)
+
+        words, boxes, confidences, line_ids, paragraph_ids = [], [], [], [], []
+        next_line = next_paragraph = 0
+        for result, (x, y) in zip(results, offsets):
+            if not len(result):
+                continue
+            words.extend(result.words)
+            boxes.append(result.boxes + np.array([x, y, x, y], dtype=np.int32))
+            confidences.append(result.confidences)
+            line_ids.append(result.line_ids + next_line)
+            paragraph_ids.append(result.paragraph_ids + next_paragraph)
+            next_line += int(result.line_ids.max()) + 1
+            next_paragraph += int(result.paragraph_ids.max()) + 1
+
+        if not words:
+            return cls()
+        return cls(words, np.concatenate(boxes), np.concatenate(confidences),
+                   np.concatenate(line_ids), np.concatenate(paragraph_ids))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a result from to_dict() output (e.g. a cached result)."""
+        return cls(data["words"], data["boxes"], data["confidences"],
+                   data["line_ids"], data["paragraph_ids"])
+
+    def to_dict(self):
+        """
+        JSON-serializable form: plain lists, one per column.
+
+        Boxes are flattened to [left, top, right, bottom, left, ...] so a
+        cached result has five lists, not one list per word.
+        """
+        return {
+            "words": list(self.words),
+            "boxes": self.boxes.ravel().tolist(),
+            "confidences": np.round(self.confidences.astype(np.float64), 1).tolist(),
+            "line_ids": self.line_ids.tolist(),
+            "paragraph_ids": self.paragraph_ids.tolist(),
+        }
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def text(self):
+        """
+        The words as plain text, built on first access.
+
+        Words are joined with spaces, lines with newlines and paragraphs with
+        a blank line, like Tesseract's own text output.
+        """
+        if self._text is None:
+            if not self.words:
+                self._text = ""
+            else:
+                # Index of the first word of every line
+                starts = [0] + (np.flatnonzero(np.diff(self.line_ids)) + 1).tolist()
+                ends = starts[1:] + [len(self.words)]
+                parts = []
+                for start, end in zip(starts, ends):
+                    if start and self.paragraph_ids[start] != self.paragraph_ids[start - 1]:
+                        parts.append("")
+                    parts.append(" ".join(self.words[start:end]))
+                self._text = "\n".join(parts)
+        return self._text
+
+    @property
+    def confidence(self):
+        """Mean word confidence (0-100); 0 if no words were found."""
+        if not len(self.confidences):
+            return 0.0
+        return float(self.confidences.mean())
+
+    def select(self, mask):
+        """A new result with only the words where `mask` is True."""
+        indices = np.flatnonzero(mask)
+        return OCRResult(
+            [self.words[index] for index in indices],
+            self.boxes[indices], self.confidences[indices],
+            self.line_ids[indices], self.paragraph_ids[indices]
+        )
+
+    def scaled(self, factor):
+        """
+        A copy with every box multiplied by `factor`, e.g. 1 / 2 to map the
+        words of an image OCR'd at twice the size back to its pixels.
+        """
+        boxes = np.rint(self.boxes * factor).astype(np.int32)
+        return OCRResult(self.words, boxes, self.confidences,
+                         self.line_ids, self.paragraph_ids)
+
+    def line_centres(self):
+        """
+        Vertical centre of each word's LINE (not of the word itself).
+
+        Returns:
+        --------
+        numpy.ndarray
+            One value per word, so lines can be kept or dropped as a whole
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.float32)
+        count = int(self.line_ids.max()) + 1
+        tops = np.full(count, np.iinfo(np.int32).max, dtype=np.int32)
+        bottoms = np.zeros(count, dtype=np.int32)
+        np.minimum.at(tops, self.line_ids, self.boxes[:, 1])
+        np.maximum.at(bottoms, self.line_ids, self.boxes[:, 3])
+        return ((tops + bottoms) / 2)[self.line_ids]
+
+    def locate(self, phrase):
+        """
+        Find where a phrase was read, ignoring case and line breaks.
+
+        Parameters:
+        -----------
+        phrase : str
+            e.g. a brand name from the application form
+
+        Returns:
+        --------
+        dict or None
+            {"box": (left, top, right, bottom), "confidence": float}
+            covering the words of the first match; None if not found
+        """
+        target = " ".join(phrase.lower().split())
+        if not target or not self.words:
+            return None
+
+        # Same normalization as VerificationService: lower case, single spaces
+        lowered = [word.lower() for word in self.words]
+        haystack = " ".join(lowered)
+        position = haystack.find(target)
+        if position < 0:
+            return None
+
+        # Character offset of every word in `haystack`
+        starts = np.cumsum([0] + [len(word) + 1 for word in lowered[:-1]])
+        first = int(np.searchsorted(starts, position, side='right')) - 1
+        last = int(np.searchsorted(starts, position + len(target) - 1, side='right')) - 1
+        boxes = self.boxes[first:last + 1]
+        return {
+            "box": (int(boxes[:, 0].min()), int(boxes[:, 1].min()),
+                    int(boxes[:, 2].max()), int(boxes[:, 3].max())),
+            "confidence": round(float(self.confidences[first:last + 1].mean()), 1),
+        }
@@ -0,0 +1,194 @@
+"""
+OCR Workers - A process pool for running Tesseract on several CPU cores
+
+Some OCR jobs are CPU-bound from start to finish (e.g. trying every
+rotation of a sideways label), so threads would mostly wait on each other
+for the GIL between Tesseract calls. This module keeps one pool of worker
+processes per web worker, created the first time it is needed.
+
+Why "spawn"?
+------------
+Worker processes are started fresh ("spawn") instead of being forked from
+the web worker. A forked child would inherit Tesseract engines, threads and
+locks that another thread might be holding at that moment; a spawned child
+imports the modules itself and builds its own engines.
+
+Nesting:
+--------
+Code running INSIDE a worker must not start another pool (every worker
+would spawn a pool of its own). in_worker() tells OCRService to do its
+parallel work serially there.
+
+Everything submitted to the pool must be picklable: module-level
+functions, and plain arguments (PIL images pickle fine). Results come
+back as OCRResult objects, whose NumPy columns pickle compactly.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+import settings
+
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+# Set by the pool initializer in worker processes
+_in_worker = False
+
+# OCRService instances of this worker process, by (page segmentation
+# mode, OCR profile name)
+_services = {}
+
+
+def _initialize_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def in_worker():
+    """True inside an OCR worker process."""
+    return _in_worker
+
+
+def worker_count():
+    """Number of worker processes (OCR_WORKER_PROCESSES, default: one per CPU)."""
+    return settings.OCR_WORKER_PROCESSES or os.cpu_count() or 1
+
+
+def new_executor(max_workers):
+    """A new, separate pool of `max_workers` spawned worker processes."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_initialize_worker
+    )
+
+
+def get_executor():
+    """
+    The process pool, created on first use.
+
+    A pool inherited through fork (gunicorn worker) belongs to the parent
+    and is replaced with a new one.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = new_executor(worker_count())
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _service(psm, profile=None):
+    """
+    This worker's OCRService for a page segmentation mode and OCR profile.
+
+    Workers don't cache results (the web worker does) and never search
+    orientations themselves.
+
+    Parameters:
+    -----------
+    psm : int
+        Page segmentation mode
+    profile : str, optional
+        Name of an OCR profile in ocr_profiles.PROFILES: the service gets
+        its own engines, started with the profile's words, patterns and
+        engine mode (None: the worker's default engines)
+    """
+    key = (psm, profile)
+    if key not in _services:
+        from ocr_cache import OCRResultCache
+        from ocr_service import OCRService, ocr_service
+        from perceptual_hash import NearDuplicateIndex
+
+        if profile is None:
+            engines = {"engine_pool": ocr_service.engine_pool,
+                       "backend": ocr_service.backend}
+        else:
+            from ocr_profiles import PROFILES
+            # No engine_pool or backend: built from the profile (see
+            # ProfiledOCR._build)
+            engines = {"profile": PROFILES[profile]}
+
+        service = OCRService(
+            cache=OCRResultCache(max_entries=0),
+            near_duplicates=NearDuplicateIndex(max_distance=0),
+            psm=psm,
+            **engines
+        )
+        service.orientation_search_below = 0
+        _services[key] = service
+    return _services[key]
+
+
+def recognize_rotated(image, rotation, psm, deadline=None, profile=None):
+    """
+    OCR a preprocessed image rotated counter-clockwise by `rotation` degrees,
+    with the engines of OCR profile `profile` (a name, None = default).
+
+    Raises DeadlineExceeded if `deadline` (a timing.Deadline) passes first.
+
+    Returns:
+    --------
+    tuple
+        (rotation, OCRResult)
+    """
+    from ocr_service import ROTATIONS
+    from timing import StageTimer
+
+    service = _service(psm, profile)
+    return rotation, service._recognize(image.transpose(ROTATIONS[rotation]),
+                                        StageTimer(), deadline)
+
+
+def recognize_band(image, psm, deadline=None, profile=None):
+    """
+    OCR one band of a tiled image (stopped at `deadline`, if given), with
+    the engines of OCR profile `profile` (a name, None = default).
+
+    Returns:
+    --------
+    OCRResult
+        Boxes in band coordinates
+    """
+    return _service(psm, profile)._run_tesseract(image, deadline)
+
+
+def read_page(image, psm, deadline=None, profile=None):
+    """
+    Preprocess, turn upright and OCR one page of a multi-page image
+    (stopped at `deadline`, if given), with the engines of OCR profile
+    `profile` (a name, None = default).
+
+    Returns:
+    --------
+    tuple
+        (OCRResult, (width, height) of the preprocessed page)
+    """
+    from timing import StageTimer
+
+    return _service(psm, profile)._read_page(image, StageTimer(), deadline)
+
+
+def warm_up():
+    """Import the OCR modules and load the Tesseract engines of this worker."""
+    from ocr_service import ocr_service
+
+    ocr_service.backend.warm()
+
+
+def extract_text(image, deadline=None):
+    """
+    Full OCR of one image (a path or encoded bytes) in this worker, with the
+    worker's settings-configured OCRService (see OCRService.extract_text_batch).
+    """
+    from ocr_service import ocr_service
+
+    if isinstance(image, (str, os.PathLike)):
+        return ocr_service.extract_text_from_image(image, deadline)
+    return ocr_service.extract_text_from_stream(image, deadline)
@@ -0,0 +1,219 @@
+"""
+Perceptual Hash Index - Recognizes re-photographed labels
+
+Why?
+----
+The OCR cache (ocr_cache.py) only helps when the exact same file is uploaded
+twice. In practice the same bottle is often photographed several times with a
+slightly different crop, zoom or JPEG quality. Those files have completely
+different bytes (and SHA-256 hashes) but look the same.
+
+dHash ("difference hash"):
+--------------------------
+A perceptual hash summarizes what an image LOOKS like in 64 bits:
+1. Shrink the image to 9x8 grayscale pixels (throws away fine detail, noise
+   and compression artifacts)
+2. For each row, compare each pixel with its right-hand neighbour
+3. Bit = 1 if the left pixel is brighter, else 0 → 8 rows x 8 comparisons = 64 bits
+
+Similar-looking images get hashes that differ in only a few bits. The number
+of differing bits is the Hamming distance:
+- 0-4 bits:  the same picture - or another label printed on the same
+             template (same brand family, different ABV or variety)
+- 10+ bits:  a different picture
+
+A near-duplicate's OCR text is therefore only a candidate: /verify re-reads
+the regions of the fields it verifies on the new photo before trusting it,
+and the index is off unless OCR_NEAR_DUPLICATE_DISTANCE is set.
+
+BK-Tree:
+--------
+To find "any stored hash within N bits of this one" without comparing against
+every stored hash, we use a BK-tree. Each node's children are keyed by their
+distance to the node. Because Hamming distance obeys the triangle inequality,
+a search only needs to visit children whose key is within
+[distance - N, distance + N], which prunes most of the tree.
+"""
+
+from collections import OrderedDict
+import threading
+
+from PIL import Image
+
+
+def dhash(image, hash_size=8):
+    """
+    Compute the 64-bit difference hash of an image.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        Any Pillow image (color or grayscale)
+    hash_size : int
+        Hash is hash_size x hash_size bits (default 8 → 64 bits)
+
+    Returns:
+    --------
+    int
+        The hash as an integer
+    """
+    # One extra column so each row has hash_size left/right comparisons
+    # reducing_gap lets Pillow shrink big photos with a fast box filter first
+    small = image.convert('L').resize(
+        (hash_size + 1, hash_size), Image.LANCZOS, reducing_gap=3.0
+    )
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            left = pixels[offset + col]
+            right = pixels[offset + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming_distance(a, b):
+    """Number of bits that differ between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with Hamming distance.
+
+    Each node is [hash, value, children] where children maps
+    distance → child node.
+    """
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, hash_value, value):
+        """Insert a hash; an identical hash replaces the stored value."""
+        if self._root is None:
+            self._root = [hash_value, value, {}]
+            self.size = 1
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(hash_value, node[0])
+            if distance == 0:
+                node[1] = value
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [hash_value, value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def find_nearest(self, hash_value, max_distance):
+        """
+        Find the closest stored hash within max_distance bits.
+
+        Returns:
+        --------
+        tuple or None
+            (distance, value) of the best match, or None if nothing is close enough
+        """
+        if self._root is None:
+            return None
+
+        best = None
+        candidates = [self._root]
+        while candidates:
+            node = candidates.pop()
+            distance = hamming_distance(hash_value, node[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+
+            # Triangle inequality: only children with
+            # |child_key - distance| <= max_distance can contain a match
+            low = distance - max_distance
+            high = distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    candidates.append(child)
+
+        return best
+
+
+class NearDuplicateIndex:
+    """
+    Bounded, thread-safe index of previously OCR'd images by perceptual hash.
+
+    BK-trees don't support deletion, so when the index is full we rebuild it
+    from the most recent half of the entries (oldest entries are dropped).
+    """
+
+    def __init__(self, max_distance=4, max_entries=1000):
+        """
+        Parameters:
+        -----------
+        max_distance : int
+            Largest Hamming distance (in bits, out of 64) still considered a
+            near-duplicate. 0 disables the index.
+        max_entries : int
+            Maximum number of images remembered
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        self._tree = BKTree()
+        # hash → value, oldest first (an image added again moves to the end)
+        self._order = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "confirmed": 0, "rejected": 0}
+
+    @property
+    def enabled(self):
+        return self.max_distance > 0 and self.max_entries > 0
+
+    def lookup(self, hash_value):
+        """
+        Return the stored value of the nearest near-duplicate, or None.
+        """
+        with self._lock:
+            match = self._tree.find_nearest(hash_value, self.max_distance)
+            if match is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return match[1]
+
+    def add(self, hash_value, value):
+        """Remember the value (e.g. an OCR result) for this hash."""
+        with self._lock:
+            # The tree replaces the value of a hash it already holds; the
+            # order refreshes it instead of listing it twice
+            self._tree.add(hash_value, value)
+            self._order[hash_value] = value
+            self._order.move_to_end(hash_value)
+
+            if len(self._order) > self.max_entries:
+                # Keep the newest half and rebuild the tree from it
+                keep = max(1, self.max_entries // 2)
+                while len(self._order) > keep:
+                    self._order.popitem(last=False)
+                self._tree = BKTree()
+                for stored_hash, stored_value in self._order.items():
+                    self._tree.add(stored_hash, stored_value)
+
+    def record(self, confirmed):
+        """Count a hit that was checked: True if it was reused, False if not."""
+        with self._lock:
+            self._counters["confirmed" if confirmed else "rejected"] += 1
+
+    def stats(self):
+        """Counters for the /metrics endpoint."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = self._tree.size
+            stats["max_distance"] = self.max_distance
+        return stats
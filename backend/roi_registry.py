@@ -0,0 +1,243 @@
+"""
+ROI Registry - Remember where each brand prints its fields
+
+The same brands come back again and again, and a brand's label layout
+hardly ever changes: the brand name is always at the top, the ABV always
+under it, the warning always in the bottom corner. Once a label of a brand
+has been verified, we know where those fields are (VerificationService
+reports the box of every field it matched, see OCRResult.locate()).
+
+How It's Used:
+--------------
+1. A label of brand X is verified with full-page OCR. If every required
+   field matched, the boxes of the matched fields are stored for brand X,
+   as fractions of the image size (so a photo taken at another resolution
+   still lines up).
+2. The next upload for brand X OCRs only those regions of interest (ROIs),
+   each grown by a margin for a photo framed a bit differently. A few small
+   crops instead of the whole label: much less for Tesseract to read.
+3. If the ROI text doesn't verify (different layout, different framing, or
+   really a mismatching label), the full page is OCR'd as before - so the
+   ROI pass can only save time, never change a verdict to "match" that the
+   full page wouldn't give.
+
+Brands are keyed by their name as typed in the form (case and spacing
+ignored). The registry is per worker process and keeps the most recently
+used brands (least recently used are forgotten first). Counters of ROI
+passes that verified and ones that fell back are exposed on /metrics.
+"""
+
+from collections import OrderedDict
+import threading
+
+from text_geometry import reading_order
+
+
+# Fields whose boxes are remembered (the others aren't on every label)
+ROI_FIELDS = ('brand_name', 'product_type', 'abv', 'net_contents', 'government_warning')
+
+# Fields that must have been located for a layout to be stored
+REQUIRED_FIELDS = ('brand_name', 'product_type', 'abv')
+
+
+def brand_key(brand_name):
+    """Registry key of a brand name: lower case, single spaces."""
+    return " ".join((brand_name or "").lower().split())
+
+
+def pixel_boxes(regions, size, margin):
+    """
+    Crop boxes of normalized regions on an image of `size`.
+
+    Parameters:
+    -----------
+    regions : iterable
+        (left, top, right, bottom) boxes as fractions of the image size
+    size : tuple
+        (width, height) of the image to crop
+    margin : float
+        Every box is grown by this fraction of the image size on each side
+
+    Returns:
+    --------
+    list
+        (left, top, right, bottom) pixel boxes in reading order; boxes that
+        overlap once grown are merged, so no text is read twice
+    """
+    width, height = size
+    boxes = [
+        [max(0, int((left - margin) * width)), max(0, int((top - margin) * height)),
+         min(width, int((right + margin) * width + 0.5)),
+         min(height, int((bottom + margin) * height + 0.5))]
+        for left, top, right, bottom in regions
+    ]
+
+    # Merge until no two boxes overlap (there are only a handful)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]),
+                                max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return reading_order([tuple(box) for box in boxes if box[2] > box[0] and box[3] > box[1]])
+
+
+def field_regions(verification, image_size):
+    """
+    Normalized boxes of the fields a verification matched and located.
+
+    Parameters:
+    -----------
+    verification : dict
+        Result of VerificationService.verify_label() with an OCRResult
+    image_size : tuple or None
+        (width, height) of the image the locations are in pixels of
+
+    Returns:
+    --------
+    dict
+        field → (left, top, right, bottom) fractions of the image size, for
+        the ROI_FIELDS that have a location. Empty if image_size is unknown
+        or a box lies outside the image (then image_size isn't the size the
+        boxes are in, e.g. a rotated page, and no box can be trusted).
+    """
+    if not image_size:
+        return {}
+    width, height = image_size
+    regions = {}
+    for field in ROI_FIELDS:
+        detail = verification["details"].get(field)
+        location = detail.get("location") if detail and detail["match"] else None
+        if location:
+            left, top, right, bottom = location["box"]
+            regions[field] = (left / width, top / height, right / width, bottom / height)
+    if any(not 0 <= fraction <= 1 for box in regions.values() for fraction in box):
+        return {}
+    return regions
+
+
+class ROIRegistry:
+    """
+    Per-brand positions of the label fields, learned from verified labels.
+
+    Usage:
+    ------
+        registry = ROIRegistry()
+        regions = registry.regions_for(form_data["brand_name"])
+        if regions:
+            # OCR only pixel_boxes(regions, size, registry.margin) ...
+        registry.learn(form_data["brand_name"], verification, image_size)
+    """
+
+    def __init__(self, enabled=True, max_brands=1000, margin=0.04):
+        """
+        Parameters:
+        -----------
+        enabled : bool
+            False never stores or returns any regions
+        max_brands : int
+            Brands remembered per process (least recently used are dropped)
+        margin : float
+            Fraction of the image size each region is grown by on every
+            side before cropping (see pixel_boxes)
+        """
+        self.enabled = enabled and max_brands > 0
+        self.max_brands = max_brands
+        self.margin = margin
+
+        self._lock = threading.Lock()
+        self._layouts = OrderedDict()
+        self._learned = 0
+        self._verified = 0
+        self._fell_back = 0
+
+    def learn(self, brand_name, verification, image_size):
+        """
+        Store the field positions of a verified label.
+
+        Parameters:
+        -----------
+        brand_name : str
+            As typed in the form
+        verification : dict
+            Result of VerificationService.verify_label() with an OCRResult
+            (so matched fields have a "location")
+        image_size : tuple or None
+            (width, height) of the image the locations are in pixels of
+
+        Returns:
+        --------
+        bool
+            True if the layout was stored (the label matched, every
+            required field was located, and inside the image)
+        """
+        if not self.enabled or not verification.get("overall_match"):
+            return False
+
+        layout = field_regions(verification, image_size)
+        if not all(field in layout for field in REQUIRED_FIELDS):
+            return False
+
+        key = brand_key(brand_name)
+        with self._lock:
+            self._layouts[key] = layout
+            self._layouts.move_to_end(key)
+            while len(self._layouts) > self.max_brands:
+                self._layouts.popitem(last=False)
+            self._learned += 1
+        return True
+
+    def regions_for(self, brand_name):
+        """
+        Normalized regions of a known brand's fields.
+
+        Returns:
+        --------
+        list or None
+            (left, top, right, bottom) fractions of the image size, one per
+            remembered field; None for unknown brands
+        """
+        if not self.enabled:
+            return None
+        key = brand_key(brand_name)
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                return None
+            self._layouts.move_to_end(key)
+            return list(layout.values())
+
+    def record(self, verified):
+        """Count an ROI pass: True if its text verified, False if it fell back."""
+        with self._lock:
+            if verified:
+                self._verified += 1
+            else:
+                self._fell_back += 1
+
+    def stats(self):
+        """
+        Counters for /metrics.
+
+        Returns:
+        --------
+        dict
+            {"enabled": bool, "brands": int, "learned": int,
+             "roi_verified": int, "roi_fell_back": int}
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "brands": len(self._layouts),
+                "learned": self._learned,
+                "roi_verified": self._verified,
+                "roi_fell_back": self._fell_back,
+            }
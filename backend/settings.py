@@ -0,0 +1,280 @@
+"""
+Settings - Environment-driven configuration for the backend services
+
+Every tunable knob of the OCR pipeline lives here so it can be changed at
+deploy time (Render dashboard, `docker run -e ...`) without touching code.
+
+Each setting reads an environment variable and falls back to a sensible
+default, so running `python app.py` locally needs no configuration at all.
+
+Example:
+--------
+    OCR_ENGINE_POOL_SIZE=2 gunicorn --threads 2 app:app
+"""
+
+import os
+
+
+def _env_int(name, default):
+    """Read an integer environment variable, falling back to `default`."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return int(value)
+
+
+def _env_float(name, default):
+    """Read a float environment variable, falling back to `default`."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return float(value)
+
+
+def _env_bool(name, default):
+    """Read a boolean environment variable ("1", "true", "yes", "on")."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Tesseract engine pool
+# ---------------------
+# Most Tesseract engines kept alive per gunicorn worker (and per OCR profile).
+# One request OCRs up to OCR_REGION_WORKERS text blocks at once, each on its
+# own engine, so the pool defaults to that many; engines are only created when
+# that many are in use at the same time. Raise it when running gunicorn with
+# --threads.
+OCR_ENGINE_POOL_SIZE = _env_int('OCR_ENGINE_POOL_SIZE', _env_int('OCR_REGION_WORKERS', 4))
+
+# Set to false to force the pytesseract subprocess path even when tesserocr
+# is installed (useful when comparing the two).
+OCR_USE_ENGINE_POOL = _env_bool('OCR_USE_ENGINE_POOL', True)
+
+# OCR backend
+# -----------
+# Which engine reads the words: 'auto' (tesserocr if installed, otherwise
+# pytesseract), 'tesserocr', 'pytesseract', or 'fake' - no OCR at all, every
+# image "contains" the same canned text (for load-testing the web tier).
+OCR_BACKEND = os.environ.get('OCR_BACKEND', 'auto').strip().lower()
+
+# How images reach the `tesseract` program when pytesseract is used:
+# 'stdin' (uncompressed PGM piped in), 'pgm' (uncompressed file in
+# /dev/shm) or 'png' (pytesseract's compressed temp file).
+OCR_SUBPROCESS_HANDOFF = os.environ.get('OCR_SUBPROCESS_HANDOFF', 'stdin').strip().lower()
+
+# Seconds each fake OCR call takes (sleeping, so no CPU is used).
+OCR_FAKE_LATENCY = _env_float('OCR_FAKE_LATENCY', 0.0)
+
+# Text the fake backend returns; empty uses a built-in sample label.
+OCR_FAKE_TEXT = os.environ.get('OCR_FAKE_TEXT', '')
+
+# OCR result cache
+# ----------------
+# Results kept in memory per worker (least recently used are evicted first).
+OCR_CACHE_SIZE = _env_int('OCR_CACHE_SIZE', 128)
+
+# Optional SQLite file shared by every worker on the host, e.g.
+# /tmp/label-app/ocr_cache.sqlite3. Empty disables the disk tier.
+OCR_CACHE_DB = os.environ.get('OCR_CACHE_DB', '')
+OCR_CACHE_DB_MAX_ENTRIES = _env_int('OCR_CACHE_DB_MAX_ENTRIES', 10000)
+
+# Near-duplicate detection (perceptual hash)
+# ------------------------------------------
+# Maximum number of differing bits (out of 64) for two photos to count as the
+# same label. 0 (the default) disables near-duplicate reuse. Labels of the
+# same brand family are 0-4 bits apart while printing a different ABV, so
+# /verify only reuses the text after re-reading the fields on the new photo.
+OCR_NEAR_DUPLICATE_DISTANCE = _env_int('OCR_NEAR_DUPLICATE_DISTANCE', 0)
+OCR_NEAR_DUPLICATE_ENTRIES = _env_int('OCR_NEAR_DUPLICATE_ENTRIES', 1000)
+
+# Preprocessing
+# -------------
+# Percentage of darkest/brightest pixels ignored when stretching contrast.
+OCR_CONTRAST_CLIP_PERCENT = _env_float('OCR_CONTRAST_CLIP_PERCENT', 1.0)
+
+# Optional binarization before OCR: '' (off), 'otsu' or 'sauvola'.
+OCR_BINARIZE = os.environ.get('OCR_BINARIZE', '').strip().lower()
+
+# Resolution normalization
+# ------------------------
+# Photos are shrunk until their small text is about this many pixels tall
+# (Tesseract reads ~20-30 px letters best). 0 disables resampling.
+OCR_TARGET_GLYPH_HEIGHT = _env_int('OCR_TARGET_GLYPH_HEIGHT', 32)
+
+# Never shrink the long side of an image below this many pixels.
+OCR_MIN_LONG_SIDE = _env_int('OCR_MIN_LONG_SIDE', 1000)
+
+# Deskew
+# ------
+# Level photos taken slightly rotated (measured from the text lines).
+OCR_DESKEW = _env_bool('OCR_DESKEW', True)
+
+# Largest tilt searched for, in degrees either way.
+OCR_DESKEW_MAX_ANGLE = _env_float('OCR_DESKEW_MAX_ANGLE', 10.0)
+
+# Smaller tilts are left alone.
+OCR_DESKEW_MIN_ANGLE = _env_float('OCR_DESKEW_MIN_ANGLE', 0.5)
+
+# Bottle curvature
+# ----------------
+# Unroll labels wrapped around a round bottle before OCR (the curvature is
+# estimated from how squeezed the text gets towards the sides).
+OCR_DEWARP = _env_bool('OCR_DEWARP', False)
+
+# Only unroll when the outermost text is squeezed to less than this fraction
+# of its width at the centre of the label.
+OCR_DEWARP_MAX_SQUEEZE = _env_float('OCR_DEWARP_MAX_SQUEEZE', 0.8)
+
+# JPEG decoding
+# -------------
+# Decode JPEGs as grayscale and, for big photos, at a reduced scale (1/2,
+# 1/4 or 1/8) chosen so the small text stays readable.
+OCR_JPEG_DRAFT = _env_bool('OCR_JPEG_DRAFT', True)
+
+# Only photos with at least this many pixels get a reduced-scale decode.
+OCR_JPEG_DRAFT_MIN_PIXELS = _env_int('OCR_JPEG_DRAFT_MIN_PIXELS', 4_000_000)
+
+# Decode limits
+# -------------
+# Images whose header claims more pixels than this are refused before
+# decoding (decompression bombs). 0 = no limit.
+OCR_MAX_IMAGE_PIXELS = _env_int('OCR_MAX_IMAGE_PIXELS', 100_000_000)
+
+# Bytes of decoded images all requests of one worker process may hold at
+# once; larger JPEGs are decoded smaller, other images larger than the whole
+# budget are refused, and requests that don't fit wait (see
+# decode_limits.py). 0 = no limit.
+OCR_DECODE_MEMORY_BUDGET = _env_int('OCR_DECODE_MEMORY_BUDGET', 200_000_000)
+
+# Text regions
+# ------------
+# Locate the text blocks first and OCR only those crops (in parallel). The
+# whole image is OCR'd instead when no blocks are found or they cover more
+# than OCR_TEXT_REGION_MAX_COVERAGE of it.
+OCR_TEXT_REGIONS = _env_bool('OCR_TEXT_REGIONS', True)
+OCR_TEXT_REGION_MAX_COVERAGE = _env_float('OCR_TEXT_REGION_MAX_COVERAGE', 0.6)
+
+# How many crops are OCR'd at once. With tesserocr, each one needs its own
+# engine, so no more run at once than OCR_ENGINE_POOL_SIZE allows.
+OCR_REGION_WORKERS = _env_int('OCR_REGION_WORKERS', 4)
+
+# Stretch the contrast of every text block on its own and invert blocks of
+# light-on-dark text (white print on a black band) before OCR.
+OCR_AUTO_POLARITY = _env_bool('OCR_AUTO_POLARITY', True)
+
+# Multi-scale OCR
+# ---------------
+# When the largest text is at least OCR_MULTI_SCALE_RATIO times the height
+# of the smallest, OCR the whole image once at a low scale for the headlines
+# and only the fine-print blocks at full (or enlarged) resolution. Text under
+# twice the smallest height counts as fine print, so the ratio must be at
+# least 2 for any headline to remain.
+OCR_MULTI_SCALE = _env_bool('OCR_MULTI_SCALE', False)
+OCR_MULTI_SCALE_RATIO = _env_float('OCR_MULTI_SCALE_RATIO', 3.0)
+if OCR_MULTI_SCALE_RATIO < 2:
+    raise ValueError(
+        f"OCR_MULTI_SCALE_RATIO must be at least 2, got {OCR_MULTI_SCALE_RATIO:g}"
+    )
+
+# Orientation
+# -----------
+# Let Tesseract's orientation detection (OSD) turn sideways labels upright.
+# Needs osd.traineddata (tesseract-ocr-osd / part of tesseract-ocr).
+OCR_ORIENTATION_OSD = _env_bool('OCR_ORIENTATION_OSD', True)
+
+# OSD's confidence in a rotation must reach this before we apply it.
+OCR_OSD_MIN_CONFIDENCE = _env_float('OCR_OSD_MIN_CONFIDENCE', 1.0)
+
+# If the mean word confidence (0-100) of the OCR result is below this, the
+# other three rotations are OCR'd in parallel and the best one wins. 0
+# disables the search. A search stops early once a rotation reaches
+# OCR_ORIENTATION_ACCEPT.
+OCR_ORIENTATION_SEARCH_BELOW = _env_float('OCR_ORIENTATION_SEARCH_BELOW', 60.0)
+OCR_ORIENTATION_ACCEPT = _env_float('OCR_ORIENTATION_ACCEPT', 75.0)
+
+# Worker processes for CPU-parallel OCR (see ocr_workers.py). 0 = one per CPU.
+OCR_WORKER_PROCESSES = _env_int('OCR_WORKER_PROCESSES', 0)
+
+# Seconds one image may take in OCRService.extract_text_batch(). 0 = no limit.
+OCR_BATCH_TIMEOUT = _env_float('OCR_BATCH_TIMEOUT', 120.0)
+
+# Quality gate
+# ------------
+# Photos that are almost entirely black or white, flat or badly blurred are
+# rejected before OCR (see image_quality.py). The defaults only catch images
+# that can't be read at all; /metrics shows how real uploads score.
+OCR_QUALITY_GATE = _env_bool('OCR_QUALITY_GATE', True)
+OCR_QUALITY_MIN_SHARPNESS = _env_float('OCR_QUALITY_MIN_SHARPNESS', 0.08)
+OCR_QUALITY_MIN_CONTRAST = _env_int('OCR_QUALITY_MIN_CONTRAST', 3)
+OCR_QUALITY_MAX_CLIPPED = _env_float('OCR_QUALITY_MAX_CLIPPED', 0.98)
+
+# Tiled OCR
+# ---------
+# Images that still have at least this many pixels after preprocessing (and
+# no usable text blocks) are OCR'd as overlapping bands on all worker
+# processes at once. 0 disables tiling.
+OCR_TILE_MIN_PIXELS = _env_int('OCR_TILE_MIN_PIXELS', 8_000_000)
+
+# Multi-page images
+# -----------------
+# Multi-page TIFFs and animated GIFs: at most this many frames are looked at
+# (one at a time), and only frames with at least OCR_FRAME_MIN_GLYPHS
+# glyph-like shapes are OCR'd (see OCRService._text_pages). 1 = first frame
+# only, as for any other image.
+OCR_MAX_FRAMES = _env_int('OCR_MAX_FRAMES', 20)
+OCR_FRAME_MIN_GLYPHS = _env_int('OCR_FRAME_MIN_GLYPHS', 20)
+
+# OCR cascade
+# -----------
+# Verify with a cheap OCR pass first and run slower passes only for fields
+# that didn't match (see ocr_cascade.py). Off by default.
+OCR_CASCADE = _env_bool('OCR_CASCADE', False)
+
+# Comma-separated tiers, cheapest first.
+OCR_CASCADE_TIERS = tuple(
+    name.strip() for name in os.environ.get(
+        'OCR_CASCADE_TIERS', 'fast,standard,binarized,rotate_90,rotate_270,rotate_180'
+    ).split(',') if name.strip()
+)
+
+# OCR profiles
+# ------------
+# Pick Tesseract settings (vocabulary, number patterns, page segmentation)
+# from the product type in /verify: wine, spirits, beer or the default (see
+# ocr_profiles.py). Every profile in use loads its own Tesseract engines.
+OCR_PROFILES = _env_bool('OCR_PROFILES', True)
+
+# Optional text file of extra words (brand names, one per line) added to
+# every label-class profile's dictionary.
+OCR_USER_WORDS_FILE = os.environ.get('OCR_USER_WORDS_FILE', '')
+
+# Brand layouts
+# -------------
+# Remember where each brand's fields were found on labels that verified, and
+# OCR only those regions for the next label of that brand (falling back to
+# the whole label if they don't verify; see roi_registry.py).
+OCR_ROI_REGISTRY = _env_bool('OCR_ROI_REGISTRY', True)
+
+# Brands remembered per worker (least recently used are forgotten first).
+OCR_ROI_MAX_BRANDS = _env_int('OCR_ROI_MAX_BRANDS', 1000)
+
+# Each region is grown by this fraction of the image size on every side, for
+# photos framed a little differently.
+OCR_ROI_MARGIN = _env_float('OCR_ROI_MARGIN', 0.04)
+
+# Uploads
+# -------
+# Uploaded images up to this many bytes stay in memory and are decoded
+# straight from there; larger ones are spooled to an anonymous temp file.
+UPLOAD_SPOOL_MAX_MEMORY = _env_int('UPLOAD_SPOOL_MAX_MEMORY', 8 * 1024 * 1024)
+
+# Request deadline
+# ----------------
+# Seconds a /verify request may spend on OCR before Tesseract is stopped and
+# the client gets a 504. Keep it below gunicorn's worker timeout (30 s by
+# default) so a stuck image never gets the whole worker killed. A client may
+# ask for less with the X-Request-Timeout header (seconds), never for more.
+# 0 = no limit (then the header alone sets the deadline).
+OCR_REQUEST_TIMEOUT = _env_float('OCR_REQUEST_TIMEOUT', 25.0)
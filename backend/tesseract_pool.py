@@ -0,0 +1,238 @@
+"""
+Tesseract Engine Pool - Long-lived Tesseract engines shared across requests
+
+Why a Pool?
+-----------
+pytesseract.image_to_string() starts a brand new `tesseract` process for every
+call. Each of those processes:
+1. Spawns (fork + exec)
+2. Loads the ~20 MB `eng.traineddata` language model from disk
+3. Reads the image back from a temporary PNG file that pytesseract wrote
+
+Steps 1-3 are paid on every single label, even though the model never changes.
+
+tesserocr talks to Tesseract through its C API instead, so we can load the
+model ONCE into a `PyTessBaseAPI` object and keep reusing it. Images are
+handed over in memory, no temp files involved.
+
+How the Pool Works:
+-------------------
+- Engines are created lazily, the first time they are needed (or eagerly via
+  warm() from the gunicorn post_fork hook, see gunicorn.conf.py)
+- A request "checks out" an engine, uses it, and returns it to the pool
+- If every engine is busy, the request waits for one to be returned
+- Each gunicorn worker process gets its own pool (engines can't be shared
+  across processes), so the pool notices when it has been forked and starts
+  over with fresh engines
+
+tesserocr is optional: if it is not installed, `available` is False and
+OCRService falls back to the pytesseract subprocess path.
+"""
+
+from contextlib import contextmanager
+import logging
+import os
+import queue
+import threading
+
+try:
+    import tesserocr
+except ImportError:  # pragma: no cover - depends on the system libtesseract
+    tesserocr = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class EngineInitError(RuntimeError):
+    """A Tesseract engine couldn't be created (e.g. missing traineddata)."""
+
+
+# Put in the idle queue when creating an engine failed, to wake up the
+# requests waiting there for an engine that will never come
+_FAILED = object()
+
+
+class TesseractEnginePool:
+    """
+    A fixed-size pool of pre-initialized tesserocr engines.
+
+    Usage:
+    ------
+        pool = TesseractEnginePool(size=2, lang='eng')
+        with pool.checkout() as engine:
+            engine.SetImage(pil_image)
+            text = engine.GetUTF8Text()
+    """
+
+    def __init__(self, size=1, lang='eng', enabled=True, oem=None, variables=None):
+        """
+        Parameters:
+        -----------
+        size : int
+            Maximum number of engines kept alive in this process
+        lang : str
+            Tesseract language passed to every engine (e.g. 'eng')
+        enabled : bool
+            False disables the pool even if tesserocr is installed
+        oem : int, optional
+            Tesseract engine mode of every engine (None: Tesseract's default)
+        variables : dict, optional
+            Tesseract variables set when each engine starts, e.g. the
+            user_words_file of an OCR profile (see ocr_profiles.py)
+        """
+        self.size = max(1, size)
+        self.lang = lang
+        self.oem = oem
+        self.variables = dict(variables or {})
+        self.enabled = enabled and tesserocr is not None
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """(Re)create the empty pool for the current process."""
+        # LIFO so the most recently used (cache-warm) engine is reused first
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._pid = os.getpid()
+
+    @property
+    def available(self):
+        """True if requests can be served from this pool."""
+        return self.enabled
+
+    def _ensure_process(self):
+        """
+        Drop engines inherited from a parent process.
+
+        gunicorn forks workers from the master. Tesseract engines hold native
+        state that must not be shared between processes, so a forked child
+        starts with an empty pool and builds its own engines.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _create_engine(self):
+        """Load the language model into a new Tesseract engine."""
+        options = {"variables": self.variables}
+        if self.oem is not None:
+            options["oem"] = self.oem
+        return tesserocr.PyTessBaseAPI(lang=self.lang, **options)
+
+    def _acquire(self):
+        """Take an idle engine, create one if below `size`, otherwise wait."""
+        self._ensure_process()
+
+        try:
+            return self._take(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                return self._create_engine()
+            except Exception as e:
+                with self._lock:
+                    self._created -= 1
+                # The next engine would fail the same way (a missing model,
+                # a bad tessdata path): turn the pool off, as warm() does,
+                # so callers fall back to pytesseract from now on
+                logger.warning("Could not initialize a Tesseract engine: %s", e)
+                self.enabled = False
+                self._idle.put(_FAILED)
+                raise EngineInitError(str(e)) from e
+
+        # Pool is at capacity - block until another request returns an engine
+        return self._take(self._idle.get())
+
+    def _take(self, engine):
+        """Return `engine` from the idle queue, or raise if the pool failed."""
+        if engine is _FAILED:
+            # Leave it for the next waiter
+            self._idle.put(_FAILED)
+            raise EngineInitError("Tesseract engine pool was turned off")
+        return engine
+
+    def _release(self, engine):
+        """Return an engine to the pool, discarding any per-image state."""
+        engine.Clear()
+        self._idle.put(engine)
+
+    @contextmanager
+    def checkout(self):
+        """
+        Borrow an engine for the duration of a `with` block.
+
+        The engine is always returned to the pool, even if OCR raises.
+        Raises EngineInitError (and turns the pool off) if a new engine
+        can't be created.
+        """
+        if not self.available:
+            raise RuntimeError("Tesseract engine pool is not available (tesserocr not installed)")
+
+        engine = self._acquire()
+        try:
+            yield engine
+        finally:
+            self._release(engine)
+
+    def warm(self):
+        """
+        Pre-initialize every engine so the first request doesn't pay the
+        model-loading cost. Called from gunicorn's post_fork hook.
+        """
+        if not self.available:
+            return
+
+        engines = []
+        try:
+            for _ in range(self.size):
+                engines.append(self._acquire())
+        except Exception as e:
+            # Don't take the worker down: OCRService falls back to pytesseract
+            logger.warning("Could not initialize Tesseract engine pool: %s", e)
+            self.enabled = False
+        finally:
+            for engine in engines:
+                self._release(engine)
+
+    def stats(self):
+        """
+        State of this process's pool, for /metrics.
+
+        Returns:
+        --------
+        dict
+            {"enabled": bool, "size": int, "engines": int, "idle": int}:
+            engines created so far (at most `size`) and how many of them
+            are waiting for a request
+        """
+        if self._pid != os.getpid():
+            # Forked, and no engine checked out yet: the parent's don't count
+            engines = idle = 0
+        else:
+            engines = self._created
+            idle = min(self._idle.qsize(), engines)
+        return {"enabled": self.enabled, "size": self.size,
+                "engines": engines, "idle": idle}
+
+    def close(self):
+        """Shut down all idle engines and free their memory."""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if engine is _FAILED:
+                continue
+            engine.End()
+            with self._lock:
+                self._created -= 1
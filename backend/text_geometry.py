@@ -0,0 +1,589 @@
+"""
+Text Geometry - Finds glyph-like shapes in an image and measures them
+
+Several OCR pipeline stages need to know "where is the text and how big is
+it?" BEFORE running Tesseract. We answer that cheaply on a small thumbnail:
+
+1. Shrink the grayscale image so its long side is ~1000 px
+2. Binarize it (Otsu threshold) and pick the "ink" side: text covers far
+   less of a label than the background does, so the minority class is ink.
+   This works for dark-on-light AND light-on-dark printing.
+3. Label connected components: groups of touching ink pixels. On a label,
+   most components are single characters.
+4. Keep components whose size and shape look like characters (not specks of
+   noise, not the bottle outline or a big logo)
+
+The result is a set of bounding boxes in ORIGINAL image coordinates that
+other stages use for glyph-size estimation and text localization.
+
+ResolutionNormalizer uses the glyph heights to shrink oversized phone photos
+to the resolution Tesseract actually needs before OCR runs.
+
+TextRegionDetector groups neighbouring glyphs into text blocks, so Tesseract
+only has to look at the parts of the photo that contain text. Step 2's
+single ink decision would miss a dark band of white lettering on an
+otherwise light label, so it searches both sides of the threshold, and
+text_polarity() then decides for each block which side is its ink.
+"""
+
+import math
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+from image_preprocessing import histogram, otsu_threshold
+
+
+# 8-connectivity: diagonal neighbours belong to the same component
+EIGHT_CONNECTED = np.ones((3, 3), dtype=bool)
+
+# text_polarity(): below this distance of the dark-pixel share from one
+# half, the histogram can't tell ink from background
+POLARITY_BALANCED = 0.15
+
+
+class GlyphBoxes:
+    """
+    Bounding boxes of glyph-like components, stored as parallel arrays.
+
+    Attributes (all NumPy arrays of equal length, original-image pixels):
+    - top, left, height, width
+    """
+
+    def __init__(self, top, left, height, width):
+        self.top = top
+        self.left = left
+        self.height = height
+        self.width = width
+
+    def __len__(self):
+        return len(self.height)
+
+
+def thumbnail(gray, max_side=1000):
+    """
+    Shrink an 'L' image by an integer factor, keeping its long side between
+    `max_side` and 2 x `max_side`.
+
+    Returns:
+    --------
+    tuple
+        (thumbnail image, scale) where scale = thumbnail size / original size
+    """
+    long_side = max(gray.size)
+    if long_side <= max_side:
+        return gray, 1.0
+
+    # reduce() is an integer box filter: very fast and good enough for analysis.
+    # Round the factor down so the thumbnail is never smaller than max_side
+    # (small print must stay measurable).
+    factor = long_side // max_side
+    if factor < 2:
+        return gray, 1.0
+    small = gray.reduce(factor)
+    return small, small.size[0] / gray.size[0]
+
+
+def ink_mask(gray):
+    """
+    Boolean mask of "ink" pixels (text strokes) of a small 'L' image.
+
+    The Otsu threshold splits pixels into dark and light; whichever class is
+    smaller is taken to be the ink.
+    """
+    pixels = np.asarray(gray)
+    hist = histogram(gray)
+    threshold = otsu_threshold(hist)
+
+    dark_pixels = hist[:threshold + 1].sum()
+    if dark_pixels <= pixels.size / 2:
+        return pixels <= threshold
+    return pixels > threshold
+
+
+def text_polarity(gray, max_side=600):
+    """
+    Is the text of an 'L' image lighter than its background?
+
+    Two clues, both from a thumbnail:
+    1. Histogram: the Otsu threshold splits the pixels into dark and light;
+       text covers less area than its background, so the minority is ink.
+    2. Edge polarity: when the two classes are about equally large (bold
+       type in a tight crop), look at where the edges are. Strokes are thin,
+       so nearly every ink pixel sits next to an edge, while the background
+       has flat stretches: the class with more edge energy (mean absolute
+       Laplacian) per pixel is the ink.
+
+    Returns:
+    --------
+    bool
+        True for light-on-dark text (white print on a black label), False
+        for the usual dark-on-light
+    """
+    small, _ = thumbnail(gray, max_side)
+    pixels = np.asarray(small, dtype=np.float32)
+    dark = pixels <= otsu_threshold(histogram(small))
+
+    dark_share = dark.mean()
+    if abs(dark_share - 0.5) > POLARITY_BALANCED:
+        return bool(dark_share > 0.5)
+
+    if min(pixels.shape) < 3:
+        return False
+    laplacian = np.abs(
+        4 * pixels[1:-1, 1:-1]
+        - pixels[:-2, 1:-1] - pixels[2:, 1:-1]
+        - pixels[1:-1, :-2] - pixels[1:-1, 2:]
+    )
+    inner = dark[1:-1, 1:-1]
+    if inner.all() or not inner.any():
+        return False
+    return bool(laplacian[~inner].mean() > laplacian[inner].mean())
+
+
+def glyph_bounds(small, min_height=4, mask=None):
+    """
+    Bounding boxes of glyph-like components of an already small 'L' image.
+
+    Parameters:
+    -----------
+    small : PIL.Image
+        'L' thumbnail
+    min_height : int
+        Smallest component height worth keeping
+    mask : numpy.ndarray, optional
+        Boolean ink mask to use instead of ink_mask(small)
+
+    Returns:
+    --------
+    GlyphBoxes
+        Boxes in the coordinates of `small`
+    """
+    if mask is None:
+        mask = ink_mask(small)
+
+    labels, count = ndimage.label(mask, structure=EIGHT_CONNECTED)
+    empty = np.zeros(0, dtype=np.float64)
+    if count == 0:
+        return GlyphBoxes(empty, empty, empty, empty)
+
+    slices = ndimage.find_objects(labels)
+    bounds = np.array(
+        [(s[0].start, s[1].start, s[0].stop, s[1].stop) for s in slices],
+        dtype=np.float64
+    )
+    top, left = bounds[:, 0], bounds[:, 1]
+    height = bounds[:, 2] - top
+    width = bounds[:, 3] - left
+    area = np.bincount(labels.ravel(), minlength=count + 1)[1:]
+
+    # Character-like: not a speck, not a huge blob, plausible aspect ratio
+    # ("l" is tall and thin, "W" is wide) and partially filled box
+    fill = area / (height * width)
+    aspect = width / height
+    keep = (
+        (height >= min_height)
+        & (height <= small.size[1] * 0.25)
+        & (aspect >= 0.1) & (aspect <= 2.5)
+        & (fill >= 0.1) & (fill <= 0.95)
+    )
+
+    return GlyphBoxes(top[keep], left[keep], height[keep], width[keep])
+
+
+def glyph_bounds_both_polarities(small, min_height=4):
+    """
+    Glyph boxes of dark AND light text on an already small 'L' image.
+
+    ink_mask() makes one decision for the whole image, so on a label with a
+    dark band of white lettering (common on craft labels) that lettering
+    would be background. Here both sides of the Otsu threshold are searched.
+    The band itself and the paper around dark text are far too big to pass
+    as glyphs; the holes of letters like "o" do pass, but lie inside their
+    letter and so add nothing to the text blocks.
+    """
+    pixels = np.asarray(small)
+    dark = pixels <= otsu_threshold(histogram(small))
+    found = [glyph_bounds(small, min_height, mask) for mask in (dark, ~dark)]
+    return GlyphBoxes(*(
+        np.concatenate([getattr(glyphs, name) for glyphs in found])
+        for name in ('top', 'left', 'height', 'width')
+    ))
+
+
+def find_glyphs(gray, max_side=1000, min_height=4):
+    """
+    Locate glyph-like connected components.
+
+    Parameters:
+    -----------
+    gray : PIL.Image
+        'L' image at full resolution
+    max_side : int
+        Long side of the analysis thumbnail
+    min_height : int
+        Smallest component height (thumbnail pixels) worth measuring;
+        anything smaller is noise or too small to measure reliably
+
+    Returns:
+    --------
+    GlyphBoxes
+        Boxes scaled back to full-resolution coordinates
+    """
+    small, scale = thumbnail(gray, max_side)
+    glyphs = glyph_bounds(small, min_height)
+    return GlyphBoxes(
+        glyphs.top / scale,
+        glyphs.left / scale,
+        glyphs.height / scale,
+        glyphs.width / scale
+    )
+
+
+def estimate_glyph_height(gray, max_side=1000, min_glyphs=15, percentile=25):
+    """
+    Estimate the height (in pixels) of the SMALLER text on the image.
+
+    We use a low percentile rather than the median: a label has a few huge
+    brand-name letters and many tiny government-warning letters, and the
+    small print is what must stay readable after resampling.
+
+    Returns:
+    --------
+    float or None
+        Glyph height in full-resolution pixels, or None if too few
+        character-like components were found to make a reliable estimate
+    """
+    glyphs = find_glyphs(gray, max_side)
+    if len(glyphs) < min_glyphs:
+        return None
+    return float(np.percentile(glyphs.height, percentile))
+
+
+class ResolutionNormalizer:
+    """
+    Downscales photos whose text is much larger than Tesseract needs.
+
+    Tesseract reads text reliably once capital letters are ~20-30 px tall;
+    its runtime grows with pixel count. A 48 MP phone photo of a label often
+    has 80-150 px letters, so most of those pixels only cost time.
+    """
+
+    def __init__(self, target_glyph_height=32, min_long_side=1000,
+                 min_reduction=0.85, analysis_side=1000):
+        """
+        Parameters:
+        -----------
+        target_glyph_height : int
+            Desired height (px) of the small text after resampling; 0 disables
+        min_long_side : int
+            Never shrink the long side of the image below this
+        min_reduction : float
+            Skip resampling unless it shrinks the image to below this fraction
+            (resampling costs time too; a 5% reduction isn't worth it)
+        analysis_side : int
+            Long side of the thumbnail used to measure the glyphs
+        """
+        self.target_glyph_height = target_glyph_height
+        self.min_long_side = min_long_side
+        self.min_reduction = min_reduction
+        self.analysis_side = analysis_side
+
+    @property
+    def enabled(self):
+        return self.target_glyph_height > 0
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        if not self.enabled:
+            return "res=off"
+        return f"res={self.target_glyph_height}:{self.min_long_side}"
+
+    def scale_for(self, gray, full_size=None):
+        """
+        Work out the resampling factor for an 'L' image (1.0 = keep as is).
+
+        Parameters:
+        -----------
+        gray : PIL.Image
+            The image to measure ('L' mode)
+        full_size : tuple, optional
+            (width, height) of the full-resolution image when `gray` is only
+            a reduced preview of it (e.g. a draft-mode JPEG decode). The
+            returned factor is then relative to full_size.
+        """
+        if full_size is None:
+            full_size = gray.size
+        if not self.enabled or max(full_size) <= self.min_long_side:
+            return 1.0
+
+        glyph_height = estimate_glyph_height(gray, self.analysis_side)
+        if glyph_height is None:
+            # No reliable measurement - don't risk making text unreadable
+            return 1.0
+
+        # Measured in preview pixels → convert to full-resolution pixels
+        glyph_height *= full_size[0] / gray.size[0]
+
+        scale = self.target_glyph_height / glyph_height
+        scale = max(scale, self.min_long_side / max(full_size))
+        if scale > self.min_reduction:
+            return 1.0
+        return scale
+
+    def normalize(self, gray, timer, scale=None):
+        """
+        Resample an 'L' image so its small text is ~target_glyph_height tall.
+
+        Parameters:
+        -----------
+        gray : PIL.Image
+        timer : StageTimer
+        scale : float, optional
+            Factor already measured by the caller (e.g. on the draft-mode
+            preview), so the glyph analysis doesn't run twice
+
+        Returns:
+        --------
+        tuple
+            (image, scale) - scale maps original coordinates to new ones
+        """
+        if scale is None:
+            with timer.stage("resolution_analysis"):
+                scale = self.scale_for(gray)
+        if scale > self.min_reduction:
+            return gray, 1.0
+
+        with timer.stage("resample"):
+            size = (max(1, round(gray.size[0] * scale)),
+                    max(1, round(gray.size[1] * scale)))
+            # Pillow's bilinear filter is antialiased when shrinking; on a
+            # 30 MP photo it is ~2x faster than LANCZOS and OCR accuracy is
+            # the same at these glyph sizes
+            resized = gray.resize(size, Image.BILINEAR, reducing_gap=2.0)
+        return resized, scale
+
+
+class TextRegionDetector:
+    """
+    Finds the blocks of text on a label so only those get OCR'd.
+
+    Most of a bottle photo is background, glass and artwork. Tesseract's
+    own layout analysis has to wade through all of it; cropping to the text
+    first saves that time, and the crops can be recognized in parallel.
+
+    How Glyphs Become Blocks:
+    -------------------------
+    Glyphs are searched in both polarities, so white lettering on a dark
+    band becomes a block just like the black text around it (each block's
+    polarity is decided later, see text_polarity). Every glyph box is
+    grown sideways by about one glyph height and up/down by a third of one,
+    and drawn into a mask. Letters of the same word (and words of the same
+    line) then touch, while separate lines and separate text blocks stay
+    apart unless they are very close. Growing each box by ITS OWN height
+    (instead of one morphological kernel for the whole image) keeps the huge
+    brand name and the tiny warning text equally well grouped. Each
+    connected blob of the mask is one block.
+
+    When Not to Crop:
+    -----------------
+    find() returns None - meaning "OCR the whole image" - when no text was
+    found (better to let Tesseract try than to return nothing), when the
+    blocks cover most of the image anyway (no savings), or when there are so
+    many blocks that per-crop overhead would outweigh the gain.
+    """
+
+    def __init__(self, enabled=True, analysis_side=1000, min_glyphs=2,
+                 max_coverage=0.6, max_regions=24):
+        """
+        Parameters:
+        -----------
+        enabled : bool
+            False makes find() always return None
+        analysis_side : int
+            Long side of the thumbnail the glyphs are found on
+        min_glyphs : int
+            Blocks with fewer glyphs are ignored (specks, logo fragments)
+        max_coverage : float
+            Give up on cropping if the blocks cover more than this fraction
+            of the image
+        max_regions : int
+            Give up on cropping if there are more blocks than this
+        """
+        self.enabled = enabled
+        self.analysis_side = analysis_side
+        self.min_glyphs = min_glyphs
+        self.max_coverage = max_coverage
+        self.max_regions = max_regions
+
+    @property
+    def signature(self):
+        """Short description of the settings, used in OCR cache keys."""
+        if not self.enabled:
+            return "regions=off"
+        return f"regions={self.min_glyphs}:{self.max_coverage}:{self.max_regions}"
+
+    def find(self, gray):
+        """
+        Locate text blocks on an 'L' image.
+
+        Returns:
+        --------
+        list or None
+            (left, top, right, bottom) boxes in `gray`'s pixel coordinates,
+            in reading order, or None if the whole image should be OCR'd
+        """
+        return self.crop_boxes(gray.size, self.blocks(gray))
+
+    def crop_boxes(self, size, blocks):
+        """
+        The boxes of blocks() worth cropping to, or None (see find()).
+
+        Parameters:
+        -----------
+        size : tuple
+            (width, height) of the image the blocks were found on
+        blocks : list or None
+            Output of blocks()
+        """
+        if not blocks or len(blocks) > self.max_regions:
+            return None
+        boxes = [box for box, _ in blocks]
+        area = sum((right - left) * (bottom - top) for left, top, right, bottom in boxes)
+        if area > self.max_coverage * size[0] * size[1]:
+            return None
+        return boxes
+
+    def blocks(self, gray):
+        """
+        Every text block on an 'L' image, with the size of its text.
+
+        Unlike find(), blocks are returned however many there are and
+        however much of the image they cover.
+
+        Returns:
+        --------
+        list or None
+            ((left, top, right, bottom), glyph_height) per block, in reading
+            order and `gray`'s pixels; glyph_height is the tallest glyph of
+            the block. None if disabled or too little text was found.
+        """
+        if not self.enabled:
+            return None
+
+        small, scale = thumbnail(gray, self.analysis_side)
+        glyphs = glyph_bounds_both_polarities(small)
+        if len(glyphs) < self.min_glyphs:
+            return None
+
+        top, left = glyphs.top, glyphs.left
+        bottom, right = top + glyphs.height, left + glyphs.width
+
+        # Grow every glyph by its own size and paint it into a mask
+        grow_x = glyphs.height
+        grow_y = glyphs.height / 3
+        rows, cols = small.size[1], small.size[0]
+        y0 = np.clip(top - grow_y, 0, rows).astype(np.intp)
+        y1 = np.clip(bottom + grow_y, 0, rows).astype(np.intp)
+        x0 = np.clip(left - grow_x, 0, cols).astype(np.intp)
+        x1 = np.clip(right + grow_x, 0, cols).astype(np.intp)
+        mask = np.zeros((rows, cols), dtype=bool)
+        for a, b, c, d in zip(y0, y1, x0, x1):
+            mask[a:b, c:d] = True
+
+        # One label per block; every glyph belongs to the block at its centre
+        blocks, count = ndimage.label(mask)
+        centre_y = ((top + bottom) / 2).astype(np.intp)
+        centre_x = ((left + right) / 2).astype(np.intp)
+        block_of = blocks[centre_y, centre_x] - 1
+
+        # Tight block bounds from the (ungrown) glyph boxes, plus a margin:
+        # Tesseract needs a little white space around the text, and thin
+        # marks that didn't pass as glyphs ("I", "/", "%") may stick out
+        # sideways - so one glyph height left and right, a quarter above
+        # and below
+        glyph_count = np.bincount(block_of, minlength=count)
+        block_top = np.full(count, np.inf)
+        block_left = np.full(count, np.inf)
+        block_bottom = np.zeros(count)
+        block_right = np.zeros(count)
+        block_glyph = np.zeros(count)
+        np.minimum.at(block_top, block_of, top)
+        np.minimum.at(block_left, block_of, left)
+        np.maximum.at(block_bottom, block_of, bottom)
+        np.maximum.at(block_right, block_of, right)
+        np.maximum.at(block_glyph, block_of, glyphs.height)
+
+        keep = glyph_count >= self.min_glyphs
+
+        margin_x = block_glyph[keep]
+        margin_y = block_glyph[keep] / 4
+        boxes = np.stack([
+            np.clip(block_left[keep] - margin_x, 0, cols),
+            np.clip(block_top[keep] - margin_y, 0, rows),
+            np.clip(block_right[keep] + margin_x, 0, cols),
+            np.clip(block_bottom[keep] + margin_y, 0, rows),
+        ], axis=1)
+
+        # Back to full-resolution pixels, rounded outwards
+        full_width, full_height = gray.size
+        boxes = [
+            (max(0, int(l / scale)), max(0, int(t / scale)),
+             min(full_width, int(np.ceil(r / scale))),
+             min(full_height, int(np.ceil(b / scale))))
+            for l, t, r, b in boxes
+        ]
+        heights = dict(zip(boxes, (block_glyph[keep] / scale).tolist()))
+        return [(box, heights[box]) for box in reading_order(boxes)]
+
+
+def horizontal_bands(height, count, overlap):
+    """
+    Split an image of `height` rows into up to `count` overlapping bands.
+
+    Bands are kept at least 4 x `overlap` tall (thinner bands would be
+    mostly overlap), so fewer than `count` may be returned.
+
+    Returns:
+    --------
+    list
+        (top, bottom, own_top, own_bottom) per band, top to bottom:
+        the band's rows are [top, bottom); it "owns" rows [own_top,
+        own_bottom) - the overlap with each neighbour is split at its middle
+    """
+    count = max(1, min(count, height // (4 * overlap)))
+    if count == 1:
+        return [(0, height, 0, height)]
+
+    # count bands of equal height whose neighbours share `overlap` rows
+    band_height = math.ceil((height + (count - 1) * overlap) / count)
+    step = band_height - overlap
+    bands = []
+    for index in range(count):
+        top = index * step
+        bottom = height if index == count - 1 else top + band_height
+        own_top = 0 if index == 0 else top + overlap // 2
+        own_bottom = height if index == count - 1 else top + step + overlap // 2
+        bands.append((top, bottom, own_top, own_bottom))
+    return bands
+
+
+def reading_order(boxes):
+    """
+    Sort (left, top, right, bottom) boxes the way a person reads them.
+
+    Boxes are taken top to bottom; a box whose vertical centre falls inside
+    the current row joins it (e.g. "45% ALC/VOL" printed next to "750 mL"),
+    and each row is read left to right.
+    """
+    rows = []
+    for box in sorted(boxes, key=lambda box: box[1]):
+        centre = (box[1] + box[3]) / 2
+        if rows and centre < rows[-1]["bottom"]:
+            rows[-1]["boxes"].append(box)
+            rows[-1]["bottom"] = max(rows[-1]["bottom"], box[3])
+        else:
+            rows.append({"bottom": box[3], "boxes": [box]})
+    return [box for row in rows for box in sorted(row["boxes"], key=lambda box: box[0])]
@@ -34,6 +34,15 @@ We document these trade-offs and keep matching simple per project requirements.
 
 import re
 
+from ocr_result import OCRResult
+
+
+# "found" of an optional field the form left empty
+NOT_CHECKED = "Not checked"
+
+# Fields that decide overall_match (the others are reported only)
+REQUIRED_FIELDS = ("brand_name", "product_type", "abv")
+
 
 class VerificationService:
     """
@@ -74,8 +83,10 @@ class VerificationService:
                 "net_contents": str (optional)
             }
 
-        ocr_text : str
-            Raw text extracted from the label image by OCR
+        ocr_text : str or OCRResult
+            Raw text extracted from the label image by OCR, or the
+            structured OCR result (its text is used, and every matched
+            field also gets a "location": where on the image it was read)
 
         Returns:
         --------
@@ -86,7 +97,11 @@ class VerificationService:
                     "brand_name": {
                         "match": bool,
                         "expected": str,
-                        "found": str or None
+                        "found": str or None,
+                        "location": {          # OCRResult input only
+                            "box": [left, top, right, bottom],
+                            "confidence": float
+                        } or None
                     },
                     # ... similar for other fields
                 },
@@ -105,6 +120,10 @@ class VerificationService:
         3. Combine results into overall match status
         """
 
+        words = None
+        if isinstance(ocr_text, OCRResult):
+            words, ocr_text = ocr_text, ocr_text.text
+
         # Normalize the OCR text once (we'll use this for all comparisons)
         # Normalization: convert to lowercase and remove extra whitespace
         # This makes matching case-insensitive and whitespace-tolerant
@@ -147,11 +166,17 @@ class VerificationService:
             normalized_ocr
         )
 
+        # Point at the words each matched field was read from (a field that
+        # wasn't checked has no text on the label to point at)
+        if words is not None:
+            for detail in results["details"].values():
+                if detail["match"] and detail["found"] and detail["found"] != NOT_CHECKED:
+                    detail["location"] = words.locate(detail["found"])
+
         # Determine overall match
         # Required fields: brand_name, product_type, abv
         # Optional fields don't affect overall match
-        required_fields = ["brand_name", "product_type", "abv"]
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if not results["details"][field]["match"]:
                 results["overall_match"] = False
                 break
@@ -369,7 +394,7 @@ class VerificationService:
             return {
                 "match": True,
                 "expected": "Not provided",
-                "found": "Not checked"
+                "found": NOT_CHECKED
             }
 
         normalized_contents = self._normalize_text(net_contents)
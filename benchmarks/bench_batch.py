@@ -0,0 +1,63 @@
+"""
+Benchmark: batch OCR throughput vs number of worker processes
+
+Renders --count synthetic label photos to a temporary directory and OCRs
+them with OCRService.extract_text_batch() using 1, 2, 4, ... worker
+processes (up to --max-workers), reporting images per second.
+
+Result caching is disabled, so every image is really OCR'd. The first
+run of each pool also pays for starting its worker processes, like a real
+nightly job would.
+
+Usage:
+------
+    python benchmarks/bench_batch.py
+    python benchmarks/bench_batch.py --count 64 --max-workers 8 --timeout 30
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic_labels import LABELS, encode, render_label
+
+from ocr_service import OCRService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=16)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timeout', type=float, default=0, help='per-image seconds (0 = none)')
+    args = parser.parse_args()
+
+    # Workers build their own OCRService from settings: turn caching off there
+    os.environ['OCR_CACHE_SIZE'] = '0'
+    os.environ['OCR_NEAR_DUPLICATE_DISTANCE'] = '0'
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index in range(args.count):
+            image, _ = render_label(LABELS[index % len(LABELS)], seed=index)
+            path = os.path.join(directory, f"label_{index:04d}.jpg")
+            with open(path, 'wb') as f:
+                f.write(encode(image))
+            paths.append(path)
+
+        service = OCRService()
+        workers = 1
+        print(f"{'workers':>8}{'seconds':>10}{'images/s':>10}{'failed':>8}")
+        while workers <= args.max_workers:
+            start = time.perf_counter()
+            failed = 0
+            for _, result in service.extract_text_batch(paths, max_workers=workers,
+                                                        timeout=args.timeout):
+                failed += not result["success"]
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8}{elapsed:>10.1f}{args.count / elapsed:>10.2f}{failed:>8}")
+            workers *= 2
+
+
+if __name__ == '__main__':
+    main()
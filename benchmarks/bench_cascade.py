@@ -0,0 +1,91 @@
+"""
+Benchmark: one standard OCR pass vs the early-exit OCR cascade
+
+For each synthetic label, in three situations:
+- upright:    a normal photo of the label
+- sideways:   the photo rotated by 90 degrees
+- mismatch:   an upright photo checked against the WRONG form data (the
+              case verification exists for, and the cascade's worst case)
+
+measures end-to-end latency (OCR + verification, milliseconds), how many
+fields matched, and which cascade tier resolved the request.
+
+Caching is disabled so every run does real OCR.
+
+Usage:
+------
+    python benchmarks/bench_cascade.py
+"""
+
+import argparse
+import statistics
+import time
+
+from PIL import Image
+
+from synthetic_labels import LABELS, encode, render_label
+
+from ocr_cache import OCRResultCache
+from ocr_cascade import OCRCascade
+from ocr_service import OCRService
+from perceptual_hash import NearDuplicateIndex
+from verification_service import verification_service
+
+
+def uncached_service():
+    return OCRService(cache=OCRResultCache(max_entries=0),
+                      near_duplicates=NearDuplicateIndex(max_distance=0))
+
+
+def standard(service, form_data, data):
+    result = service.extract_text_from_stream(data)
+    verification = verification_service.verify_label(form_data, result["text"])
+    return verification["details"], "-"
+
+
+def cascade(cascade, form_data, data):
+    result = cascade.verify(form_data, data)
+    return result.get("details", {}), result["tier"] or "unresolved"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=4000)
+    args = parser.parse_args()
+
+    service = uncached_service()
+    variants = {
+        "standard": (standard, service),
+        "cascade": (cascade, OCRCascade(base_service=service)),
+    }
+
+    print(f"{'label':<22}{'case':<10}{'variant':<10}{'ms':>8}{'fields':>8}  tier")
+    latencies = {(name, case): [] for name in variants
+                 for case in ('upright', 'sideways', 'mismatch')}
+    for index, form_data in enumerate(LABELS):
+        image, _ = render_label(form_data, width=args.width, height=args.height, seed=index)
+        cases = {
+            "upright": (form_data, encode(image)),
+            "sideways": (form_data, encode(image.transpose(Image.Transpose.ROTATE_90))),
+            "mismatch": (LABELS[(index + 1) % len(LABELS)], encode(image)),
+        }
+        for case, (form, data) in cases.items():
+            for name, (run, target) in variants.items():
+                start = time.perf_counter()
+                details, tier = run(target, form, data)
+                elapsed = (time.perf_counter() - start) * 1000
+                latencies[(name, case)].append(elapsed)
+                matched = sum(1 for detail in details.values() if detail["match"])
+                print(f"{form_data['brand_name']:<22}{case:<10}{name:<10}"
+                      f"{elapsed:>8.0f}{matched:>5}/{len(details)}  {tier}")
+
+    print()
+    print(f"{'case':<10}{'standard ms':>14}{'cascade ms':>14}")
+    for case in ('upright', 'sideways', 'mismatch'):
+        print(f"{case:<10}{statistics.median(latencies[('standard', case)]):>14.0f}"
+              f"{statistics.median(latencies[('cascade', case)]):>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark: full JPEG decode vs draft-mode (reduced-scale, grayscale) decode
+
+For each test JPEG, measures:
+- decode time (median over --repeats runs, milliseconds)
+- peak RSS growth caused by the decode (MB)
+
+"full" is what OCRService used to do: Image.open() + full RGB decode +
+convert('L'). "draft" is OCRService._load_image() plus the grayscale step,
+i.e. a preview probe followed by a grayscale decode at the largest safe
+JPEG scale.
+
+Every measurement runs in a fresh subprocess, because peak RSS can only go up
+within a process.
+
+Usage:
+------
+    python benchmarks/bench_decode.py                 # synthetic 12 MP / 48 MP labels
+    python benchmarks/bench_decode.py photo1.jpg ...  # your own photos
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic_labels import LABELS, encode, render_label
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB.
+
+    Prefers VmHWM from /proc: ru_maxrss is inherited from the parent
+    across fork + exec on Linux, so a child would start with the parent's
+    peak (e.g. from rendering the 48 MP test image).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fallback: Linux reports KB, macOS bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def worker(mode, path):
+    """Decode `path` once in this process and print time + RSS growth as JSON."""
+    import io
+    from PIL import Image
+    from ocr_service import OCRService
+    from timing import Deadline, StageTimer
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    service = OCRService()
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == 'full':
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        gray = image.convert('L')
+    else:
+        image, _ = service._load_image(io.BytesIO(data), StageTimer(),
+                                       service.decode_budget.reservation(Deadline()))
+        gray = image.convert('L') if image.mode != 'L' else image
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "ms": elapsed,
+        "rss_mb": peak_rss_mb() - baseline,
+        "size": list(gray.size),
+    }))
+
+
+def measure(mode, path, repeats):
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', mode, path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "ms": statistics.median(run["ms"] for run in runs),
+        "rss_mb": statistics.median(run["rss_mb"] for run in runs),
+        "size": runs[0]["size"],
+    }
+
+
+def synthetic_images(directory):
+    """Portrait labels at 12 MP and 48 MP, the range of current phone cameras."""
+    paths = []
+    for width, height in ((3000, 4000), (6000, 8000)):
+        image, _ = render_label(LABELS[0], width=width, height=height)
+        path = os.path.join(directory, f"label_{width}x{height}.jpg")
+        with open(path, 'wb') as f:
+            f.write(encode(image, quality=90))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('images', nargs='*', help='JPEG files (default: synthetic)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.images or synthetic_images(directory)
+
+        print(f"{'image':<26}{'mode':<7}{'decoded size':>14}{'median ms':>11}{'peak RSS MB':>13}")
+        for path in paths:
+            for mode in ('full', 'draft'):
+                result = measure(mode, path, args.repeats)
+                size = "x".join(str(v) for v in result["size"])
+                print(f"{os.path.basename(path):<26}{mode:<7}{size:>14}"
+                      f"{result['ms']:>11.1f}{result['rss_mb']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cylindrical dewarping of labels on round bottles
+
+Wraps the synthetic labels around a bottle (benchmarks/synthetic_labels.py
+wrap_cylinder) at several angles and reports, per angle:
+- the curvature CylinderDewarper estimates vs the true one
+- the time of the estimate and of the unroll (milliseconds)
+- OCR accuracy and fields found (incl. the government warning) with the
+  dewarp stage off and on
+
+Labels are rendered at 3x and shrunk after wrapping, so the squeezed text
+near the edges loses detail the way it does in a real photo.
+
+Usage:
+------
+    python benchmarks/bench_dewarp.py
+    python benchmarks/bench_dewarp.py --width 1400 --angles 0 45 60 70
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from synthetic_labels import LABELS, encode, fields_found, render_label, text_accuracy, wrap_cylinder
+
+from dewarp import CURVATURE_STEP, CylinderDewarper
+from ocr_cache import OCRResultCache
+from ocr_service import OCRService
+from perceptual_hash import NearDuplicateIndex
+
+
+def photograph(form_data, seed, width, angle):
+    """A label of `width` px wrapped `angle` degrees each way, as (image, truth)."""
+    image, truth = render_label(form_data, width=3 * width, height=4 * width, seed=seed)
+    if angle:
+        image = wrap_cylinder(image, angle)
+    return image.resize((image.size[0] // 3, image.size[1] // 3), Image.BOX), truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--width', type=int, default=1200, help='label width in pixels')
+    parser.add_argument('--angles', type=int, nargs='+', default=[0, 45, 60, 70])
+    args = parser.parse_args()
+
+    dewarper = CylinderDewarper(enabled=True)
+    services = {
+        enabled: OCRService(
+            dewarper=CylinderDewarper(enabled=enabled),
+            cache=OCRResultCache(max_entries=0),
+            near_duplicates=NearDuplicateIndex(max_distance=0)
+        )
+        for enabled in (False, True)
+    }
+
+    print(f"{'angle':>6}{'curv.':>7}{'est.':>7}{'est ms':>8}{'unroll ms':>10}"
+          f"{'acc off':>9}{'acc on':>8}{'fields off':>11}{'fields on':>10}")
+    for angle in args.angles:
+        estimates, estimate_ms, unroll_ms = [], [], []
+        accuracy = {False: [], True: []}
+        fields = {False: 0, True: 0}
+        for index, form_data in enumerate(LABELS):
+            image, truth = photograph(form_data, index, args.width, angle)
+            gray = image.convert('L')
+
+            start = time.perf_counter()
+            buckets = dewarper.estimate(gray)
+            estimate_ms.append((time.perf_counter() - start) * 1000)
+            if buckets:
+                estimates.append(buckets[1] * CURVATURE_STEP)
+                start = time.perf_counter()
+                dewarper.unroll(gray, *buckets)
+                unroll_ms.append((time.perf_counter() - start) * 1000)
+
+            data = encode(image)
+            for enabled, service in services.items():
+                text = service.extract_text_from_stream(data)["text"]
+                accuracy[enabled].append(text_accuracy(text, truth))
+                fields[enabled] += fields_found(text, form_data)
+
+        # Half the photo's width over the radius (see dewarp.remap_table)
+        radius = args.width / (2 * np.radians(angle)) if angle else None
+        true = f"{gray.size[0] / 2 / radius:.2f}" if radius else "flat"
+        estimated = f"{statistics.mean(estimates):.2f}" if estimates else "flat"
+        unroll = f"{statistics.median(unroll_ms):.1f}" if unroll_ms else "-"
+        print(f"{angle:>6}{true:>7}{estimated:>7}{statistics.median(estimate_ms):>8.1f}{unroll:>10}"
+              f"{statistics.mean(accuracy[False]):>9.3f}{statistics.mean(accuracy[True]):>8.3f}"
+              f"{fields[False]:>11}{fields[True]:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: handing images to the `tesseract` process (PNG file vs PGM)
+
+For each label, preprocessed the way OCRService does it, measures per
+handoff (see backend/ocr_backends.py):
+- encode time: writing the image the way that handoff does (milliseconds)
+- encoded size (KB)
+- OCR wall time: the whole PytesseractBackend.recognize() call, i.e.
+  encode + process start + model load + recognition + reading the TSV
+- whether the words match those of the "png" handoff (they should: every
+  format is lossless)
+
+Handoffs:
+- "png":   pytesseract's path, a zlib-compressed PNG temp file
+- "pgm":   an uncompressed PGM file in a RAM-backed directory
+- "stdin": uncompressed PGM bytes piped into `tesseract stdin stdout`
+
+The OCR columns need the `tesseract` program; without it only the encode
+columns are filled in.
+
+Usage:
+------
+    python benchmarks/bench_handoff.py
+    python benchmarks/bench_handoff.py --width 1200 --repeats 5
+"""
+
+import argparse
+import io
+import shutil
+import statistics
+import tempfile
+import time
+
+import pytesseract
+
+from synthetic_labels import LABELS, render_label
+
+from ocr_backends import HANDOFFS, RAM_DIR, PytesseractBackend
+from ocr_service import OCRService
+
+
+def encode(image, handoff):
+    """Write `image` the way `handoff` does; returns the number of bytes."""
+    if handoff == 'stdin':
+        buffer = io.BytesIO()
+        image.save(buffer, format='PPM')
+        return buffer.tell()
+    directory = RAM_DIR if handoff == 'pgm' else tempfile.gettempdir()
+    with tempfile.NamedTemporaryFile(dir=directory) as f:
+        image.save(f, format='PPM' if handoff == 'pgm' else 'PNG')
+        return f.tell()
+
+
+def median_ms(function, repeats):
+    """Median wall time of `function()` over `repeats` runs, and its last result."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--width', type=int, default=2400, help='label width in pixels')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    has_tesseract = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+    if not has_tesseract:
+        print("tesseract program not found: measuring encode time only\n")
+
+    service = OCRService()
+    backends = {handoff: PytesseractBackend(handoff=handoff) for handoff in HANDOFFS}
+
+    print(f"{'label':<22}{'handoff':>8}{'encode ms':>11}{'KB':>8}{'OCR ms':>9}{'same words':>12}")
+    for index, form_data in enumerate(LABELS):
+        image, _ = render_label(form_data, width=args.width,
+                                height=args.width * 4 // 3, seed=index)
+        processed = service._preprocess_image(image)
+
+        reference = None
+        for handoff in ('png', 'pgm', 'stdin'):
+            encode_ms, size = median_ms(lambda: encode(processed, handoff), args.repeats)
+            ocr_ms, same = "-", "-"
+            if has_tesseract:
+                backend = backends[handoff]
+                elapsed, words = median_ms(lambda: backend.recognize(processed, service.psm),
+                                           args.repeats)
+                ocr_ms = f"{elapsed:.0f}"
+                if reference is None:
+                    reference = words.words
+                same = "yes" if words.words == reference else "NO"
+            print(f"{form_data['brand_name']:<22}{handoff:>8}{encode_ms:>11.1f}"
+                  f"{size / 1024:>8.0f}{ocr_ms:>9}{same:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark: peak memory of concurrent requests, with and without decode limits
+
+Runs OCRService.extract_text_from_stream() on several threads at once (like
+one gunicorn worker with several threads) and reports per run:
+- peak RSS growth of the process (MB)
+- wall time (seconds) for all requests
+- how the requests ended (success, too_large, ...) and how often one had to
+  wait for the decode budget
+
+Images:
+- "photo": a large label saved as PNG. PNG has no reduced-scale decode, so
+  every request decodes all of its pixels (4 bytes each, RGB).
+- "bomb": a ~165 KB PNG of a blank 12000 x 12000 page, written row by row so
+  this script never holds it decoded (a decompression bomb).
+
+Modes:
+- "unbounded": OCR_DECODE_MEMORY_BUDGET=0, OCR_MAX_IMAGE_PIXELS=0 (Pillow's
+  own guard only warns below twice its limit, so the bomb is decoded)
+- "bounded":   the settings' limits (or --budget / --max-image-pixels)
+
+Children run with MALLOC_MMAP_THRESHOLD_=4194304, as in the Dockerfile
+(unless it's set already): with glibc's default, memory freed by one thread
+stays in that thread's malloc arena, and the bounded runs would still peak
+at about one decoded image per thread.
+
+The OCR itself runs on the fake backend (see backend/ocr_backends.py): the
+memory in question is the decoded image's, and Tesseract would only make
+each run take longer. Every run is a fresh subprocess, because peak RSS can
+only go up within a process.
+
+Usage:
+------
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --threads 1 4 8 --budget 150000000
+"""
+
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+from bench_decode import peak_rss_mb
+from synthetic_labels import LABELS, render_label
+
+import settings
+
+
+def write_photo(path, width):
+    """A label `width` pixels wide (3:4 portrait), as RGB PNG."""
+    image, _ = render_label(LABELS[0], width=width, height=width * 4 // 3)
+    image.save(path, format='PNG', compress_level=1)
+
+
+def write_bomb(path, width, height):
+    """
+    A grayscale PNG of a blank page, compressed one row at a time.
+
+    Returns the file size in bytes.
+    """
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    compressor = zlib.compressobj(9)
+    row = b'\x00' + b'\xff' * width  # filter type 0, white pixels
+    data = b''.join(compressor.compress(row) for _ in range(height)) + compressor.flush()
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b'IDAT', data))
+        f.write(chunk(b'IEND', b''))
+    return os.path.getsize(path)
+
+
+def worker(path, threads):
+    """Run `threads` concurrent requests on `path` and print the results as JSON."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from ocr_service import ocr_service
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(ocr_service.extract_text_from_stream, [data] * threads))
+    elapsed = time.perf_counter() - start
+
+    outcomes = {}
+    for result in results:
+        outcome = "success" if result["success"] else result["error_code"]
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    print(json.dumps({
+        "seconds": elapsed,
+        "rss_mb": peak_rss_mb() - baseline,
+        "outcomes": outcomes,
+        "waits": ocr_service.decode_budget.stats()["waits"],
+    }))
+
+
+def measure(path, threads, limits):
+    env = dict(
+        os.environ,
+        OCR_BACKEND='fake',
+        OCR_CACHE_SIZE='0',
+        OCR_CACHE_DB='',
+        OCR_NEAR_DUPLICATE_DISTANCE='0',
+        OCR_DECODE_MEMORY_BUDGET=str(limits[0]),
+        OCR_MAX_IMAGE_PIXELS=str(limits[1]),
+        MALLOC_MMAP_THRESHOLD_=os.environ.get('MALLOC_MMAP_THRESHOLD_', '4194304'),
+    )
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', path, str(threads)],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--width', type=int, default=5000, help='photo width in pixels')
+    parser.add_argument('--budget', type=int, default=settings.OCR_DECODE_MEMORY_BUDGET,
+                        help='decode budget in bytes')
+    parser.add_argument('--max-image-pixels', type=int, default=settings.OCR_MAX_IMAGE_PIXELS)
+    parser.add_argument('--worker', nargs=2, metavar=('PATH', 'THREADS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], int(args.worker[1]))
+        return
+
+    modes = {"unbounded": (0, 0), "bounded": (args.budget, args.max_image_pixels)}
+    print(f"bounded: OCR_DECODE_MEMORY_BUDGET={args.budget}, "
+          f"OCR_MAX_IMAGE_PIXELS={args.max_image_pixels}\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        photo = os.path.join(directory, 'photo.png')
+        write_photo(photo, args.width)
+        bomb = os.path.join(directory, 'bomb.png')
+        bomb_kb = write_bomb(bomb, 12000, 12000) / 1024
+        images = {
+            f"photo {args.width}x{args.width * 4 // 3}": photo,
+            f"bomb ({bomb_kb:.0f} KB)": bomb,
+        }
+
+        print(f"{'image':<22}{'threads':>8}  {'mode':<10}{'peak RSS MB':>12}"
+              f"{'seconds':>9}{'waits':>7}  outcomes")
+        for name, path in images.items():
+            for threads in args.threads:
+                for mode, limits in modes.items():
+                    result = measure(path, threads, limits)
+                    outcomes = ", ".join(f"{count} {outcome}"
+                                         for outcome, count in result["outcomes"].items())
+                    print(f"{name:<22}{threads:>8}  {mode:<10}{result['rss_mb']:>12.0f}"
+                          f"{result['seconds']:>9.2f}{result['waits']:>7}  {outcomes}")
+
+
+if __name__ == '__main__':
+    main()
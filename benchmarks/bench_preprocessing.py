@@ -0,0 +1,101 @@
+"""
+Benchmark: legacy ImageEnhance preprocessing vs the NumPy pipeline
+
+Measures, for each preprocessing variant:
+- latency (median over --repeats runs, milliseconds)
+- OCR accuracy (character similarity to the ground truth, and how many
+  label fields VerificationService still finds)
+
+Usage:
+------
+    python benchmarks/bench_preprocessing.py                # synthetic labels
+    python benchmarks/bench_preprocessing.py --images DIR   # your own photos
+
+With --images, every image may have a ground-truth file next to it with the
+same name and a .txt extension; accuracy is only reported when it exists.
+Pass --no-ocr to measure latency only (no Tesseract needed).
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from PIL import Image, ImageEnhance
+
+from synthetic_labels import LABELS, render_label, text_accuracy, fields_found
+
+from image_preprocessing import PreprocessingPipeline
+from ocr_service import OCRService
+
+
+def legacy_preprocess(image):
+    """The original _preprocess_image: grayscale + ImageEnhance.Contrast(2.0)."""
+    return ImageEnhance.Contrast(image.convert('L')).enhance(2.0)
+
+
+VARIANTS = {
+    "legacy (ImageEnhance 2.0)": legacy_preprocess,
+    "numpy auto-contrast": PreprocessingPipeline().run,
+    "numpy + otsu": PreprocessingPipeline(binarize='otsu').run,
+    "numpy + sauvola": PreprocessingPipeline(binarize='sauvola').run,
+}
+
+
+def load_samples(images_dir):
+    """Yield (name, image, truth, form_data) tuples."""
+    if images_dir:
+        patterns = ('*.jpg', '*.jpeg', '*.png', '*.gif', '*.tif', '*.tiff')
+        paths = sorted(p for pattern in patterns
+                       for p in glob.glob(os.path.join(images_dir, pattern)))
+        for path in paths:
+            truth_path = os.path.splitext(path)[0] + '.txt'
+            truth = open(truth_path).read() if os.path.exists(truth_path) else None
+            yield os.path.basename(path), Image.open(path).convert('RGB'), truth, None
+    else:
+        for index, form_data in enumerate(LABELS):
+            image, truth = render_label(form_data, seed=index)
+            yield form_data["brand_name"], image, truth, form_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--images', help='directory of label images (default: synthetic)')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--no-ocr', action='store_true', help='skip the accuracy measurement')
+    args = parser.parse_args()
+
+    ocr = OCRService()
+    latencies = {name: [] for name in VARIANTS}
+    accuracies = {name: [] for name in VARIANTS}
+    fields = {name: [] for name in VARIANTS}
+
+    for sample_name, image, truth, form_data in load_samples(args.images):
+        image.load()
+        print(f"{sample_name}: {image.size[0]}x{image.size[1]}")
+        for name, preprocess in VARIANTS.items():
+            runs = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                processed = preprocess(image)
+                runs.append((time.perf_counter() - start) * 1000)
+            latencies[name].append(statistics.median(runs))
+
+            if not args.no_ocr and truth is not None:
+                text = ocr._run_tesseract(processed).text
+                accuracies[name].append(text_accuracy(text, truth))
+                if form_data:
+                    fields[name].append(fields_found(text, form_data))
+
+    print()
+    print(f"{'variant':<28}{'median ms':>12}{'accuracy':>12}{'fields':>10}")
+    for name in VARIANTS:
+        latency = statistics.median(latencies[name])
+        accuracy = f"{statistics.mean(accuracies[name]):.3f}" if accuracies[name] else "-"
+        found = f"{statistics.mean(fields[name]):.2f}" if fields[name] else "-"
+        print(f"{name:<28}{latency:>12.1f}{accuracy:>12}{found:>10}")
+
+
+if __name__ == '__main__':
+    main()
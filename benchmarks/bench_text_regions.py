@@ -0,0 +1,98 @@
+"""
+Benchmark: OCR on the whole image vs OCR on detected text blocks
+
+For each label, measures:
+- OCR latency (median over --repeats runs, milliseconds), including the
+  text-region detection for the region variants
+- OCR accuracy (character similarity to the ground truth, and how many
+  label fields VerificationService still finds)
+
+Variants:
+- "full image":        one Tesseract call on the preprocessed image
+- "regions, 1 worker": text blocks OCR'd one after the other
+- "regions, N workers": text blocks OCR'd concurrently (N = --workers)
+- "multi-scale, N workers": headlines OCR'd on the whole image at a low
+  scale, fine-print blocks on their own (enlarged if needed), concurrently
+
+Usage:
+------
+    python benchmarks/bench_text_regions.py
+    python benchmarks/bench_text_regions.py --workers 8 --repeats 5
+    python benchmarks/bench_text_regions.py --width 600   # low-resolution photos
+"""
+
+import argparse
+import statistics
+import time
+
+from synthetic_labels import LABELS, render_label, text_accuracy, fields_found
+
+from ocr_service import OCRService
+from tesseract_pool import TesseractEnginePool
+
+
+def make_service(workers):
+    """An OCRService with one Tesseract engine per concurrent crop."""
+    service = OCRService(engine_pool=TesseractEnginePool(size=workers))
+    service.region_workers = workers
+    return service
+
+
+def run_variant(service, image, mode):
+    if mode == "multi-scale":
+        blocks = service.text_regions.blocks(image)
+        words = service._ocr_multi_scale(image, blocks) if blocks else None
+        if words is not None:
+            return words.text
+    if mode in ("regions", "multi-scale"):
+        regions = service.text_regions.find(image)
+        if regions:
+            return service._ocr_regions(image, regions).text
+    return service._run_tesseract(image).text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--width', type=int, default=2400, help='label width in pixels')
+    args = parser.parse_args()
+
+    variants = {
+        "full image": (make_service(1), "full"),
+        "regions, 1 worker": (make_service(1), "regions"),
+        f"regions, {args.workers} workers": (make_service(args.workers), "regions"),
+        f"multi-scale, {args.workers} workers": (make_service(args.workers), "multi-scale"),
+    }
+    latencies = {name: [] for name in variants}
+    accuracies = {name: [] for name in variants}
+    fields = {name: [] for name in variants}
+
+    for index, form_data in enumerate(LABELS):
+        image, truth = render_label(form_data, width=args.width,
+                                    height=args.width * 4 // 3, seed=index)
+        processed = variants["full image"][0]._preprocess_image(image)
+        regions = variants["full image"][0].text_regions.find(processed)
+        print(f"{form_data['brand_name']}: {len(regions or [])} text blocks")
+
+        for name, (service, mode) in variants.items():
+            run_variant(service, processed, mode)  # warm up the engines
+            runs = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                text = run_variant(service, processed, mode)
+                runs.append((time.perf_counter() - start) * 1000)
+            latencies[name].append(statistics.median(runs))
+            accuracies[name].append(text_accuracy(text, truth))
+            fields[name].append(fields_found(text, form_data))
+
+    print()
+    print(f"{'variant':<26}{'median ms':>12}{'accuracy':>12}{'fields':>10}")
+    for name in variants:
+        print(f"{name:<26}{statistics.median(latencies[name]):>12.1f}"
+              f"{statistics.mean(accuracies[name]):>12.3f}"
+              f"{statistics.mean(fields[name]):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Synthetic label generator shared by the benchmark scripts
+
+Real label photos can't be committed to the repo, so the benchmarks render
+labels with KNOWN text. That lets us measure OCR accuracy (how much of the
+ground-truth text came back) as well as speed.
+
+Each label mimics the layout of a real one: big brand name, product type,
+ABV, net contents and the small-print government warning, on a slightly
+tinted background with optional blur/noise/JPEG artifacts to look like a
+phone photo.
+"""
+
+import io
+import os
+import random
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Make the backend modules importable when running `python benchmarks/...`
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+GOVERNMENT_WARNING = (
+    "GOVERNMENT WARNING: (1) ACCORDING TO THE SURGEON GENERAL, WOMEN SHOULD NOT "
+    "DRINK ALCOHOLIC BEVERAGES DURING PREGNANCY BECAUSE OF THE RISK OF BIRTH "
+    "DEFECTS. (2) CONSUMPTION OF ALCOHOLIC BEVERAGES IMPAIRS YOUR ABILITY TO "
+    "DRIVE A CAR OR OPERATE MACHINERY, AND MAY CAUSE HEALTH PROBLEMS."
+)
+
+LABELS = [
+    {"brand_name": "Old Tom Distillery", "product_type": "Bourbon Whiskey",
+     "abv": "45", "net_contents": "750 mL"},
+    {"brand_name": "Creekwood Cellars", "product_type": "Cabernet Sauvignon",
+     "abv": "13.5", "net_contents": "750 mL"},
+    {"brand_name": "Harbor Light Brewing", "product_type": "India Pale Ale",
+     "abv": "6.8", "net_contents": "12 fl oz"},
+    {"brand_name": "Silver Birch", "product_type": "London Dry Gin",
+     "abv": "40", "net_contents": "1 L"},
+]
+
+
+def _font(size):
+    return ImageFont.load_default(size=size)
+
+
+def _wrap(text, font, max_width, draw):
+    """Greedy word wrap so the warning paragraph fits the label width."""
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if draw.textlength(candidate, font=font) <= max_width:
+            line = candidate
+        else:
+            lines.append(line)
+            line = word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def render_label(form_data, width=2400, height=3200, seed=0, blur=0.8,
+                 noise=6, background=(236, 228, 210), ink=(35, 30, 28)):
+    """
+    Render a label image and return (image, ground_truth_text).
+
+    Sizes are relative to `width`, so larger labels mean larger glyphs,
+    like photographing the same bottle with a higher resolution camera.
+    """
+    rng = random.Random(seed)
+    image = Image.new('RGB', (width, height), background)
+    draw = ImageDraw.Draw(image)
+    margin = width // 12
+    unit = width / 2400
+
+    lines = [
+        (form_data["brand_name"].upper(), int(150 * unit)),
+        (form_data["product_type"].upper(), int(90 * unit)),
+        (f"{form_data['abv']}% ALC/VOL", int(80 * unit)),
+        (form_data["net_contents"], int(80 * unit)),
+    ]
+
+    y = height // 8
+    truth = []
+    for text, size in lines:
+        font = _font(size)
+        text_width = draw.textlength(text, font=font)
+        draw.text(((width - text_width) / 2, y), text, fill=ink, font=font)
+        truth.append(text)
+        y += int(size * 1.8)
+
+    # Small print near the bottom, like the real warning statement
+    y = int(height * 0.7)
+    font = _font(int(38 * unit))
+    for line in _wrap(GOVERNMENT_WARNING, font, width - 2 * margin, draw):
+        draw.text((margin, y), line, fill=ink, font=font)
+        truth.append(line)
+        y += int(38 * unit * 1.4)
+
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur * unit))
+    if noise:
+        noise_layer = Image.effect_noise((width, height), noise * 4).convert('RGB')
+        image = Image.blend(image, noise_layer, noise / 100.0)
+    # Slight vignette-like gradient so the background isn't perfectly flat
+    shade = Image.linear_gradient('L').resize((width, height))
+    image = Image.composite(image, Image.new('RGB', (width, height), (150, 140, 120)),
+                            shade.point(lambda v: 255 - v // (6 + rng.randint(0, 3))))
+    return image, "\n".join(truth)
+
+
+def wrap_cylinder(image, half_angle_degrees=60, background=(60, 60, 60)):
+    """
+    Photograph a flat label wrapped around a round bottle, from the front.
+
+    The label covers +/- `half_angle_degrees` of the bottle's circumference;
+    its centre faces the camera and its sides curve away, so text towards
+    the left and right edges is squeezed horizontally (by cos(angle)). The
+    camera is far away compared to the bottle (orthographic view), so lines
+    stay straight. A small margin of `background` is added on both sides.
+    """
+    width, height = image.size
+    half_angle = np.radians(half_angle_degrees)
+    radius = width / (2 * half_angle)
+
+    # Column x of the photo shows the label at arc length R * asin(x / R)
+    half_width = radius * np.sin(half_angle)
+    margin = width // 20
+    out_width = int(2 * half_width) + 2 * margin
+    x = np.arange(out_width) - out_width / 2 + 0.5
+    source = width / 2 + radius * np.arcsin(np.clip(x / radius, -1, 1))
+    inside = np.abs(x) <= half_width
+
+    pixels = np.asarray(image.convert('RGB'))
+    columns = np.clip(source.astype(np.intp), 0, width - 1)
+    wrapped = pixels[:, columns]
+    wrapped[:, ~inside] = background
+    return Image.fromarray(wrapped)
+
+
+def encode(image, fmt='JPEG', quality=90):
+    """Encode an image to bytes the way a phone upload would arrive."""
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.save(buffer, format=fmt, quality=quality)
+    else:
+        image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def text_accuracy(ocr_text, truth):
+    """
+    Character-level similarity (0-1) between OCR output and ground truth,
+    after the same normalization VerificationService uses.
+    """
+    from difflib import SequenceMatcher
+    from verification_service import verification_service
+
+    normalized_ocr = verification_service._normalize_text(ocr_text)
+    normalized_truth = verification_service._normalize_text(truth)
+    return SequenceMatcher(None, normalized_ocr, normalized_truth, autojunk=False).ratio()
+
+
+def fields_found(ocr_text, form_data):
+    """Number of fields (incl. the government warning) VerificationService matches."""
+    from verification_service import verification_service
+
+    result = verification_service.verify_label(form_data, ocr_text)
+    return sum(1 for detail in result["details"].values() if detail["match"])
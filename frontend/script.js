@@ -52,9 +52,9 @@ document.addEventListener('DOMContentLoaded', function() {
         // Check if a file was actually selected
         if (file) {
             // Validate file type
-            const validTypes = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif'];
+            const validTypes = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/tiff'];
             if (!validTypes.includes(file.type)) {
-                showError('Please select a valid image file (JPEG, PNG, or GIF)');
+                showError('Please select a valid image file (JPEG, PNG, GIF, or TIFF)');
                 imageInput.value = '';  // Clear the input
                 return;
             }
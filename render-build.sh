@@ -5,10 +5,10 @@ set -o errexit  # Exit on error
 
 echo "==> Installing Tesseract OCR..."
 apt-get update
-apt-get install -y tesseract-ocr
+apt-get install -y tesseract-ocr libtesseract-dev libleptonica-dev pkg-config g++
 
 echo "==> Installing Python dependencies..."
 pip install --upgrade pip
-pip install -r requirements.txt
+pip install -r requirements.txt -r requirements-tesserocr.txt
 
 echo "==> Build complete!"